@@ -9,24 +9,98 @@ along with solution generation.
 #include <algorithm>
 #include <random>
 #include <fstream>
+#include <chrono>
+#include <cmath>
+#include <climits>
+#include <mutex>
+#include <map>
 
 
 extern "C" {
+    __declspec(dllexport) long long monotonic_ns();
     __declspec(dllexport) int generate_number(
-        int number_array[7], int recent[], int recent_count
+        int number_array[7], int recent[], int recent_count,
+        int *cancel, long long deadline_ns, int integer_only
     );
+    __declspec(dllexport) int get_possible_numbers(
+        int number_array[7], int possible[], int integer_only);
     __declspec(dllexport) void get_solution(
         int numbers_array[], int number_count, int target,
         char operators_c_str[], int parentheses_setting, char filename[]
     );
-    __declspec(dllexport) double eval(char expression[], int first, int last);
+    __declspec(dllexport) int get_solution_to_buffer(
+        int numbers_array[], int number_count, int target,
+        char operators_c_str[], int parentheses_setting, int integer_only,
+        char buffer[], int buffer_size, int *cancel, long long deadline_ns,
+        char nearest_buffer[], double *nearest_value, void *found
+    );
+    __declspec(dllexport) int get_pairwise_solutions_to_buffer(
+        int numbers_array[], int number_count, int target,
+        char operators_c_str[], int integer_only, int max_solutions,
+        char buffer[], int buffer_size, int *cancel, long long deadline_ns,
+        char nearest_buffer[], double *nearest_value, void *found,
+        int *status
+    );
+    __declspec(dllexport) void *create_reachability_map(
+        int number_array[], int number_count, int min_value, int max_value,
+        int integer_only, int *cancel, long long deadline_ns);
+    __declspec(dllexport) int *get_reachability_entries(void *map);
+    __declspec(dllexport) char *get_reachability_arena(void *map);
+    __declspec(dllexport) int get_reachability_arena_size(void *map);
+    __declspec(dllexport) void free_reachability_map(void *map);
+    __declspec(dllexport) void estimate_difficulty(
+        int number_array[], int number_count, int target,
+        long long *solution_count, int *min_number_count, double *fraction);
+    __declspec(dllexport) int sample_solutions_to_buffer(
+        int numbers_array[], int number_count, int target,
+        char operators_c_str[], int parentheses_setting, int integer_only,
+        int sample_size, char buffer[], int buffer_size,
+        int *cancel, long long deadline_ns,
+        char nearest_buffer[], double *nearest_value, void *found
+    );
+    __declspec(dllexport) int enumerate_solutions(
+        int numbers_array[], int number_count, int min_count, int max_count,
+        int target, char operators_c_str[], int parentheses_setting,
+        int integer_only, int (*callback)(const char *solution),
+        int *cancel, long long deadline_ns, void *found
+    );
+    __declspec(dllexport) void *create_solution_set();
+    __declspec(dllexport) void free_solution_set(void *found);
+    __declspec(dllexport) int add_to_solution_set(
+        void *found, char expression[]);
+    __declspec(dllexport) int eval_exact(
+        char expression[], long long *numerator, long long *denominator);
+    __declspec(dllexport) void eval_exact_many(
+        char expressions[], int offsets[], int count,
+        long long numerators[], long long denominators[], int statuses[]);
 }
 
 
-struct StartParts {
-    std::vector<std::string> start;
-    std::vector<int> start_number_indexes;
-    std::vector<int> start_operator_indexes;
+// Most numbers a solution can use.
+const int MAX_SOLUTION_NUMBERS = 7;
+// Numbers, operators and (many) parentheses.
+const int MAX_EXPRESSION_TOKENS = 64;
+
+// Expression tokens: numbers are themselves (never negative),
+// whereas operators and parentheses are negative.
+const int ADD = -1;
+const int SUBTRACT = -2;
+const int MULTIPLY = -3;
+const int DIVIDE = -4;
+const int OPEN = -5;
+const int CLOSE = -6;
+
+
+// Candidate expression of a solution search as an array of tokens,
+// so it can be built, copied and evaluated without any allocation.
+// Also tracks where the numbers and operators are as parentheses
+// are inserted (number indexes have an extra index for the end).
+struct Expression {
+    int tokens[MAX_EXPRESSION_TOKENS];
+    int length;
+    int number_count;
+    int number_indexes[MAX_SOLUTION_NUMBERS + 1];
+    int operator_indexes[MAX_SOLUTION_NUMBERS - 1];
 };
 
 
@@ -36,273 +110,523 @@ struct Parentheses {
 };
 
 
-// Checks if a character is in a STL string.
-bool char_in_string(char c, std::string str) {
-    return str.find(c) != std::string::npos;
+// Closest expression to the target found so far in a search,
+// for when there is no exact solution.
+// Only expressions with whole number values are considered.
+struct Nearest {
+    bool track; // Only tracked if needed.
+    long double distance;
+    long double value;
+    std::string expression;
+};
+
+
+// Canonical forms of the solutions found so far, which can be shared
+// by many searches (across threads) so that solutions equivalent
+// to one already found are skipped.
+struct SolutionSet {
+    std::set<std::string> forms;
+    std::mutex mutex;
+};
+
+
+// Expression tree in canonical form: either a number, or a sum ('+')
+// or product ('*') of parts with signs (- for subtraction/division).
+// Sums and products are flattened and their parts sorted, so that
+// expressions only differing by commutativity or associativity
+// have the same canonical text.
+struct CanonicalForm {
+    char type; // 'n', '+' or '*'
+    std::string text;
+    std::vector<std::pair<int, std::string>> parts;
+};
+
+
+// Status codes of a search which stopped early (always negative).
+const int SEARCH_CANCELLED = -2;
+const int SEARCH_TIMED_OUT = -3;
+// Cancellation and the deadline are checked every n candidates.
+const int SEARCH_CHECK_INTERVAL = 256;
+
+
+// Allows a long search to stop early, either when cancelled through
+// a flag shared with the caller, or once a deadline has passed.
+struct SearchControl {
+    volatile int *cancel; // NULL if the search cannot be cancelled.
+    long long deadline_ns; // Monotonic time, 0 if there is no deadline.
+    int countdown; // Candidates remaining until the next check.
+    int status; // 0 whilst searching, or else why the search stopped.
+};
+
+
+// Gets the current monotonic time in nanoseconds (for deadlines).
+long long monotonic_ns() {
+    return std::chrono::duration_cast<std::chrono::nanoseconds>(
+        std::chrono::steady_clock::now().time_since_epoch()).count();
+}
+
+
+// The first check is immediate, so a search cancelled (or out of time)
+// before it even starts never runs.
+SearchControl make_search_control(int *cancel, long long deadline_ns) {
+    SearchControl control = {cancel, deadline_ns, 1, 0};
+    return control;
+}
+
+
+// Periodically checks if the search must stop (cancelled or timed out).
+// Once it must stop, true is always returned.
+bool should_stop(SearchControl &control) {
+    if (control.status) {
+        return true;
+    }
+    if (--control.countdown) {
+        return false;
+    }
+    control.countdown = SEARCH_CHECK_INTERVAL;
+    if (control.cancel != NULL && *control.cancel) {
+        control.status = SEARCH_CANCELLED;
+    } else if (control.deadline_ns && monotonic_ns() >= control.deadline_ns) {
+        control.status = SEARCH_TIMED_OUT;
+    }
+    return control.status;
+}
+
+
+// Generates a random number from a minimum to maximum.
+int generate_random_number(int minimum, int maximum) {
+    std::random_device device;
+    std::mt19937 rng(device());
+    std::uniform_int_distribution<std::mt19937::result_type>
+        random_generator(minimum, maximum);
+    return random_generator(rng);
 }
 
 
-// Checks if a character is in a C string.
-bool char_in_string(char c, char str[], int length) {
-    for (int i = 0; i < length; i++) {
-        if (c == str[i]) {
-            return true;
+// Gets the expression of numbers before any parentheses are added,
+// with operators yet to be set.
+Expression make_expression(int numbers[], int number_count) {
+    Expression expression;
+    expression.length = 0;
+    expression.number_count = number_count;
+    for (int i = 0; i < number_count; i++) {
+        expression.number_indexes[i] = expression.length;
+        expression.tokens[expression.length++] = numbers[i];
+        if (i < number_count - 1) {
+            expression.operator_indexes[i] = expression.length;
+            expression.tokens[expression.length++] = ADD;
         }
     }
-    return false;
+    expression.number_indexes[number_count] = expression.length + 1;
+    return expression;
 }
 
 
-// Joins STL strings in a vector with a given separator.
-std::string
-join_strings(std::vector<std::string> &vector, std::string sep = "") {
-    std::string result = vector[0];
-    for (int i = 1; i < vector.size(); i++) {
-        result += vector[i] + sep;
+// Gets the token of an operator character.
+int get_operator_token(char c) {
+    switch (c) {
+        case '+':
+            return ADD;
+        case '-':
+            return SUBTRACT;
+        case '*':
+            return MULTIPLY;
+        default:
+            return DIVIDE;
     }
-    return result;
 }
 
 
-// Gets Cartesian product of a STL string with length n.
-std::vector<std::string> string_product(std::string str, int repeat) {
-    std::vector<std::string> result;
-    int indexes[repeat];
-    std::string new_string = "";
-    for (int i = 0; i < repeat; i++) {
-        indexes[i] = 0;
+// Every operator of a solution can be any of the operators allowed.
+// Each subset of operators is identified by a mask
+// (bit 0 for +, bit 1 for -, bit 2 for *, bit 3 for /).
+const char OPERATOR_CHARACTERS[] = "+-*/";
+const int OPERATOR_SUBSET_COUNT = 1 << 4;
+
+
+// Operators of an expression (token per operator), along with
+// which of them are + or - (bit per operator) for check_to_evaluate.
+struct OperatorProduct {
+    int tokens[MAX_SOLUTION_NUMBERS - 1];
+    int additive;
+};
+
+
+// Gets the operator subset mask of a C string of operators.
+int get_operator_subset(char operators[]) {
+    int subset = 0;
+    for (int i = 0; operators[i]; i++) {
+        const char *found = strchr(OPERATOR_CHARACTERS, operators[i]);
+        if (found != NULL) {
+            subset |= 1 << (found - OPERATOR_CHARACTERS);
+        }
+    }
+    return subset;
+}
+
+
+// Gets Cartesian product of a subset of operators with length n.
+std::vector<OperatorProduct> get_operator_products(int subset, int repeat) {
+    std::vector<OperatorProduct> products;
+    std::vector<int> operators;
+    for (int i = 0; OPERATOR_CHARACTERS[i]; i++) {
+        if (subset & 1 << i) {
+            operators.push_back(i);
+        }
     }
-    int max_index = str.length() - 1;
+    if (operators.empty()) {
+        return products;
+    }
+    int indexes[MAX_SOLUTION_NUMBERS - 1] = {0};
     while (true) {
+        OperatorProduct product;
+        product.additive = 0;
         for (int i = 0; i < repeat; i++) {
-            new_string += str[indexes[i]];
+            int index = operators[indexes[i]];
+            product.tokens[i] = get_operator_token(
+                OPERATOR_CHARACTERS[index]);
+            if (index < 2) {
+                product.additive |= 1 << i;
+            }
         }
-        result.push_back(new_string);
-        new_string.clear();
+        products.push_back(product);
 
-        for (int i = repeat - 1; i >= 0; i--) {
-            if (indexes[i]++ == max_index) {
-                if (i == 0) {
-                    // Final product.
-                    return result;
-                }
-            } else {
-                // Reset to 0 for all characters to the right.
-                for (int j = i + 1; j < repeat; j++) {
-                    indexes[j] = 0;
-                }
-                break;
-            }
+        // Increment the rightmost index possible,
+        // resetting to 0 for all indexes to the right.
+        int i = repeat - 1;
+        while (i >= 0 && ++indexes[i] == (int) operators.size()) {
+            indexes[i--] = 0;
         }
+        if (i < 0) {
+            // Final product.
+            return products;
+        }
+    }
+}
+
+
+// Sets the operators of an expression.
+void set_operators(
+    Expression &expression, const OperatorProduct &operators
+) {
+    for (int i = 0; i < expression.number_count - 1; i++) {
+        expression.tokens[expression.operator_indexes[i]] =
+            operators.tokens[i];
+    }
+}
+
+
+// Inserts a token into an expression at a given index.
+void insert_token(Expression &expression, int index, int token) {
+    memmove(
+        expression.tokens + index + 1, expression.tokens + index,
+        (expression.length - index) * sizeof(int));
+    expression.tokens[index] = token;
+    expression.length++;
+}
+
+
+// Exact fraction in lowest terms (with a positive denominator),
+// or an invalid result if the status is not 0.
+struct Rational {
+    long long numerator;
+    long long denominator;
+    int status;
+};
+
+
+// Statuses of an invalid rational (see Rational).
+const int RATIONAL_DIVISION_BY_ZERO = 1;
+const int RATIONAL_OVERFLOW = 2;
+// A missing operand or parenthesis (malformed expression).
+const int RATIONAL_INVALID_EXPRESSION = 3;
+
+
+// Greatest common divisor of two non-negative integers.
+long long gcd(long long a, long long b) {
+    while (b) {
+        long long remainder = a % b;
+        a = b;
+        b = remainder;
+    }
+    return a;
+}
+
+
+// Makes a rational from a fraction, reducing it to lowest terms
+// (not needed at all for integers).
+Rational make_rational(long long numerator, long long denominator = 1) {
+    if (denominator < 0) {
+        numerator = -numerator;
+        denominator = -denominator;
     }
+    if (denominator != 1) {
+        long long divisor = gcd(std::abs(numerator), denominator);
+        numerator /= divisor;
+        denominator /= divisor;
+    }
+    return {numerator, denominator, 0};
+}
+
+
+// Gets the status of an invalid result of an operation on two rationals,
+// or 0 if neither is invalid.
+int get_status(Rational &a, Rational &b) {
+    return a.status ? a.status : b.status;
 }
 
 
-// Gets permutations of a vector of length n, recursively.
-std::vector<std::vector<int>>
-permutations(std::vector<int> &vector, int length) {
-    std::vector<std::vector<int>> result;
-    if (length == 1) {
-        for (int value : vector) {
-            result.push_back((std::vector<int>) {value});
+// Adds or subtracts two rationals, detecting overflow.
+Rational add_rationals(Rational a, Rational b, bool is_adding) {
+    Rational result = {0, 1, get_status(a, b)};
+    if (result.status) {
+        return result;
+    }
+    if (a.denominator == 1 && b.denominator == 1) {
+        // Integers - by far the most common.
+        long long &numerator = result.numerator;
+        if (
+            is_adding
+            ? __builtin_add_overflow(a.numerator, b.numerator, &numerator)
+            : __builtin_sub_overflow(a.numerator, b.numerator, &numerator)
+        ) {
+            result.status = RATIONAL_OVERFLOW;
         }
         return result;
     }
-    std::vector<int> temp_vector, vector_part;
-    for (int i = 0; i < vector.size(); i++) {
-        vector_part.clear();
-        for (int j = 0; j < vector.size(); j++) {
-            if (j != i) {
-                vector_part.push_back(vector[j]);
-            }
+    long long divisor = a.denominator == 1 || b.denominator == 1 ?
+        1 : gcd(a.denominator, b.denominator);
+    long long left, right, denominator;
+    if (
+        __builtin_mul_overflow(a.numerator, b.denominator / divisor, &left)
+        || __builtin_mul_overflow(b.numerator, a.denominator / divisor, &right)
+        || __builtin_mul_overflow(
+            a.denominator, b.denominator / divisor, &denominator)
+        || (is_adding
+            ? __builtin_add_overflow(left, right, &left)
+            : __builtin_sub_overflow(left, right, &left))
+    ) {
+        result.status = RATIONAL_OVERFLOW;
+        return result;
+    }
+    if (divisor == 1) {
+        // Adding an integer to a fraction in lowest terms
+        // (or adding fractions with coprime denominators) never
+        // gives a fraction which can be reduced.
+        return {left, denominator, 0};
+    }
+    return make_rational(left, denominator);
+}
+
+
+// Multiplies or divides two rationals, detecting overflow.
+// Factors common to a numerator and the other denominator are
+// cancelled first, so the result is already in lowest terms.
+Rational multiply_rationals(Rational a, Rational b, bool is_dividing) {
+    Rational result = {0, 1, get_status(a, b)};
+    if (result.status) {
+        return result;
+    }
+    if (is_dividing) {
+        if (!b.numerator) {
+            result.status = RATIONAL_DIVISION_BY_ZERO;
+            return result;
         }
-        for (std::vector<int> vect : permutations(vector_part, length - 1)) {
-            temp_vector = {vector[i]};
-            for (int value : vect) {
-                temp_vector.push_back(value);
-            }
-            result.push_back(temp_vector);
+        b = b.numerator < 0 ?
+            (Rational) {-b.denominator, -b.numerator, 0}
+            : (Rational) {b.denominator, b.numerator, 0};
+    }
+    if (a.denominator == 1 && b.denominator == 1) {
+        if (__builtin_mul_overflow(
+            a.numerator, b.numerator, &result.numerator)
+        ) {
+            result.status = RATIONAL_OVERFLOW;
         }
+        return result;
+    }
+    long long a_divisor = gcd(std::abs(a.numerator), b.denominator);
+    long long b_divisor = gcd(std::abs(b.numerator), a.denominator);
+    if (
+        __builtin_mul_overflow(
+            a.numerator / a_divisor, b.numerator / b_divisor,
+            &result.numerator)
+        || __builtin_mul_overflow(
+            a.denominator / b_divisor, b.denominator / a_divisor,
+            &result.denominator)
+    ) {
+        result.status = RATIONAL_OVERFLOW;
     }
     return result;
 }
 
 
-// Generates a random number from a minimum to maximum.
-int generate_random_number(int minimum, int maximum) {
-    std::random_device device;
-    std::mt19937 rng(device());
-    std::uniform_int_distribution<std::mt19937::result_type>
-        random_generator(minimum, maximum);
-    return random_generator(rng);
-}
-
+Rational evaluate_exact_sum(const int tokens[], int length, int &i);
 
-// For eval: add or subtract the number? Or is it the first?
-void add_or_subtract(double &total, int previous_is_add, double number) {
-    if (previous_is_add == -1) {
-        // Start of expression - first number
-        total = number;
-    } else if (previous_is_add == 1) {
-        // Add
-        total += number;
-    } else {
-        // Subtract
-        total -= number;
-    }
-}
-
-
-// Evaluates a simple maths expression with only +/-/*/'/'/().
-// Only the requirements of this software is needed, so not for general use.
-// Order of operations followed.
-double eval(char expression[], int first, int last) {
-    double total = 0; // Running total
-    int number = -1; // Holds current number if any.
-    double previous_number = -1;
-    int previous_is_add = -1; // Holds if previous operator is + or not.
-    double multiplying_and_dividing_total = -1;
-    bool is_multiplying = false;
-    bool is_dividing = false;
-    bool just_evaluated_parentheses = false;
-    int i = first; // Starting index
-    int end = last != -1 ? last : strlen(expression) - 1; // Last index
-    // Needed for parentheses evaluation.
-    int r, nested;
-    double result;
-
-    while (i <= end) {
-        if (expression[i] >= '0') {
-            // Digit (other characters are all less than '0')
-            number = (number * 10 * (number != -1)) + expression[i++] - 48;
-            just_evaluated_parentheses = false;
-        } else if (expression[i] == '(') {
-            // Parentheses expression (evaluate recursively)
-            r = 0;
-            nested = 1;
-            while (nested) {
-                r++;
-                if (expression[i+r] == '(') {
-                    nested++;
-                } else if (expression[i+r] == ')') {
-                    nested--;
-                }
-            }
-            result = eval(expression, i+1, i+r-1);
-            previous_number = result;
-            if (std::isnan(result)) {
-                // Invalid
-                return nan("");
-            }
-            if (is_multiplying) {
-                if (multiplying_and_dividing_total != 0) {
-                    multiplying_and_dividing_total *= result;
-                }  else if (result == 0) {
-                    multiplying_and_dividing_total = 0;
-                }
-            } else if (is_dividing)  {
-                if (result == 0) {
-                    // Cannot divide by 0
-                    return nan("");
-                } else if (multiplying_and_dividing_total != 0) {
-                    multiplying_and_dividing_total /= result;
-                }
-            } else {
-                add_or_subtract(total, previous_is_add, result);
-            }
-            i += r + 1;
-            just_evaluated_parentheses = true;
-        } else {
-            // Operator
-            if (is_dividing && number == 0 && !just_evaluated_parentheses) {
-                return nan("");
-            } else if (number != -1) {
-                if (is_multiplying) {
-                    multiplying_and_dividing_total *= number;
-                } else if (is_dividing)  {
-                    multiplying_and_dividing_total /= number;
-                } else {
-                    add_or_subtract(total, previous_is_add, number);
-                }
-                previous_number = number;
-                number = -1;
-            }
 
-            is_multiplying = expression[i] == '*';
-            is_dividing = expression[i] == '/';
-            if (
-                (is_multiplying || is_dividing) 
-                && multiplying_and_dividing_total == -1
-            ) {
-                // Start multiplying/dividing
-                multiplying_and_dividing_total = previous_number;
-                if (previous_is_add == -1) {
-                    total = 0;
-                } else if (previous_is_add) {
-                    total -= previous_number;
-                } else {
-                    total += previous_number;
-                }
-            } else if (!(is_multiplying || is_dividing)) {
-                if (multiplying_and_dividing_total != -1) {
-                    // Stop multiplying/dividing
-                    add_or_subtract(
-                        total, previous_is_add, multiplying_and_dividing_total);
-                    multiplying_and_dividing_total = -1;
-                }
-                previous_is_add = expression[i] == '+';
-            }
-            i++;
-            just_evaluated_parentheses = false;
+// Evaluates a number or parenthesised expression from index i,
+// moving i past it. Invalid if the operand or its closing
+// parenthesis is missing.
+Rational evaluate_exact_operand(const int tokens[], int length, int &i) {
+    Rational invalid = {0, 1, RATIONAL_INVALID_EXPRESSION};
+    if (i >= length) {
+        return invalid;
+    }
+    if (tokens[i] == OPEN) {
+        i++;
+        Rational result = evaluate_exact_sum(tokens, length, i);
+        if (i >= length || tokens[i] != CLOSE) {
+            return invalid;
         }
+        i++;
+        return result;
+    }
+    if (tokens[i] < 0) {
+        return invalid;
+    }
+    return make_rational(tokens[i++]);
+}
+
+
+// Evaluates multiplication and division from index i, moving i past it.
+Rational evaluate_exact_product(const int tokens[], int length, int &i) {
+    Rational result = evaluate_exact_operand(tokens, length, i);
+    while (i < length && (tokens[i] == MULTIPLY || tokens[i] == DIVIDE)) {
+        bool is_dividing = tokens[i++] == DIVIDE;
+        result = multiply_rationals(
+            result, evaluate_exact_operand(tokens, length, i), is_dividing);
     }
+    return result;
+}
 
-    if (is_dividing && number == 0 && !just_evaluated_parentheses) {
-        return nan("");
-    } else if (number != -1) {
-        // Final number
-        if (is_multiplying) {
-            multiplying_and_dividing_total *= number;
-        } else if (is_dividing) {
-            multiplying_and_dividing_total /= number;
-        } else {
-            add_or_subtract(total, previous_is_add, number);
-        }
+
+// Evaluates addition and subtraction from index i, moving i past it.
+Rational evaluate_exact_sum(const int tokens[], int length, int &i) {
+    Rational result = evaluate_exact_product(tokens, length, i);
+    while (i < length && (tokens[i] == ADD || tokens[i] == SUBTRACT)) {
+        bool is_adding = tokens[i++] == ADD;
+        result = add_rationals(
+            result, evaluate_exact_product(tokens, length, i), is_adding);
     }
-    
-    if (multiplying_and_dividing_total != -1) {
-        // Final multiplying/dividing total
-        add_or_subtract(
-            total, previous_is_add, multiplying_and_dividing_total);
+    return result;
+}
+
+
+// Evaluates an expression as tokens exactly, following the order
+// of operations. Division by 0, overflow or a malformed expression
+// gives an invalid result.
+Rational evaluate_exact(const int tokens[], int length) {
+    int i = 0;
+    Rational result = evaluate_exact_sum(tokens, length, i);
+    if (!result.status && i < length) {
+        // Tokens left over, such as an unopened closing parenthesis.
+        result.status = RATIONAL_INVALID_EXPRESSION;
     }
+    return result;
+}
+
 
-    return total;
+long long evaluate_integer_sum(Expression &expression, int &i);
+
+
+// Same as evaluate_operand, but for evaluate_integer.
+long long evaluate_integer_operand(Expression &expression, int &i) {
+    if (expression.tokens[i] == OPEN) {
+        i++;
+        long long result = evaluate_integer_sum(expression, i);
+        i++; // Closing parenthesis.
+        return result;
+    }
+    return expression.tokens[i++];
 }
 
 
-// Gets starting number and operator indexes, along with the
-// initial parts of the expression when no parentheses have been added.
-StartParts get_starting_positions(std::vector<int> &numbers) {
-    std::vector<int> start_number_indexes;
-    for (int i = 0; i < ((numbers.size() + 1) * 2); i += 2) {
-        start_number_indexes.push_back(i);
+// Same as evaluate_product, but for evaluate_integer.
+// Gives up as soon as the rule is broken (see evaluate_integer).
+long long evaluate_integer_product(Expression &expression, int &i) {
+    long long result = evaluate_integer_operand(expression, i);
+    while (
+        result && i < expression.length && (
+            expression.tokens[i] == MULTIPLY
+            || expression.tokens[i] == DIVIDE)
+    ) {
+        bool is_dividing = expression.tokens[i++] == DIVIDE;
+        long long operand = evaluate_integer_operand(expression, i);
+        if (!operand || (is_dividing && result % operand)) {
+            return 0;
+        }
+        result = is_dividing ? result / operand : result * operand;
     }
+    return result;
+}
+
 
-    std::vector<int> start_operator_indexes;
-    for (int i = 1; i < numbers.size() * 2; i += 2) {
-        start_operator_indexes.push_back(i);
+// Same as evaluate_sum, but for evaluate_integer.
+// Gives up as soon as the rule is broken (see evaluate_integer).
+long long evaluate_integer_sum(Expression &expression, int &i) {
+    long long result = evaluate_integer_product(expression, i);
+    while (
+        result && i < expression.length && (
+            expression.tokens[i] == ADD || expression.tokens[i] == SUBTRACT)
+    ) {
+        bool is_adding = expression.tokens[i++] == ADD;
+        long long operand = evaluate_integer_product(expression, i);
+        if (!operand) {
+            return 0;
+        }
+        result = is_adding ? result + operand : result - operand;
+        if (result <= 0) {
+            return 0;
+        }
     }
+    return result;
+}
+
 
-    std::vector<std::string> start;
-    for (int number : numbers) {
-        start.push_back(std::to_string(number));
-        start.push_back("");
+// Evaluates an expression in which every intermediate result must be
+// a positive integer (no fractions or negatives), exactly.
+// Returns 0 if the expression breaks the rule, without evaluating
+// the rest of the expression.
+long long evaluate_integer(Expression &expression) {
+    int i = 0;
+    return evaluate_integer_sum(expression, i);
+}
+
+
+// Checks if an operator binds tighter than + and -.
+bool is_multiply_or_divide(int token) {
+    return token == MULTIPLY || token == DIVIDE;
+}
+
+
+// Converts an expression token into a string.
+std::string token_to_string(int token) {
+    switch (token) {
+        case ADD:
+            return "+";
+        case SUBTRACT:
+            return "-";
+        case MULTIPLY:
+            return "*";
+        case DIVIDE:
+            return "/";
+        case OPEN:
+            return "(";
+        case CLOSE:
+            return ")";
+        default:
+            return std::to_string(token);
     }
-    start.pop_back();
+}
 
-    StartParts start_parts = {
-        start, start_number_indexes, start_operator_indexes};
-    return start_parts;
+
+// Converts an expression into a string such as 25+50*(4-2).
+// Only needed for expressions which are actually returned.
+std::string expression_to_string(Expression &expression) {
+    std::string result;
+    for (int i = 0; i < expression.length; i++) {
+        result += token_to_string(expression.tokens[i]);
+    }
+    return result;
 }
 
 
@@ -313,14 +637,13 @@ StartParts get_starting_positions(std::vector<int> &numbers) {
 // - There is addition or subtraction; and
 // - All of the parentheses change evaluation
 // Especially important for a large number of expression parts.
-bool
-check_to_evaluate(std::string &operators, std::vector<std::string> &parts) {
-    if (!char_in_string('*', operators) && !char_in_string('/', operators)) {
+// Operators are only identified by which of them are +/- (bit per
+// operator), so the result can be stored for every template.
+bool check_to_evaluate(int additive, Expression &expression) {
+    if (additive == (1 << (expression.number_count - 1)) - 1) {
         // No point in evaluating only +/- with any parentheses.
         return false;
-    } else if (
-        !char_in_string('+', operators) && !char_in_string('-', operators)
-    ) {
+    } else if (!additive) {
         // No point in evaluating only x or / with any parentheses.
         return false;
     }
@@ -337,20 +660,19 @@ check_to_evaluate(std::string &operators, std::vector<std::string> &parts) {
     bool before_opening_parenthesis[8];
     int before_opening_parenthesis_index = 0;
     int operator_index = 0;
-    char add_subtract[3] = "+-";
 
-    int i = 0;
-    for (std::string part : parts) {
-        if (part == "(") {
+    int *tokens = expression.tokens;
+    for (int i = 0; i < expression.length; i++) {
+        if (tokens[i] == OPEN) {
             // New set of parentheses opened.
             opened++;
             // Assume otherwise until confirmed.
             has_add_or_subtract[has_add_or_subtract_index++] = false;
             before_opening_parenthesis[before_opening_parenthesis_index++] =
-                i == 0 || parts[i-1] == "("
-                || char_in_string(operators[operator_index-1], add_subtract, 2);
+                i == 0 || tokens[i-1] == OPEN
+                || additive >> (operator_index - 1) & 1;
         } else if (opened) {
-            if (part == ")") {
+            if (tokens[i] == CLOSE) {
                 // Parentheses are closing.
                 if (!has_add_or_subtract[--has_add_or_subtract_index]) {
                     return false;
@@ -359,27 +681,22 @@ check_to_evaluate(std::string &operators, std::vector<std::string> &parts) {
                     before_opening_parenthesis[
                         --before_opening_parenthesis_index] &&
                     (
-                        i + 1 >= parts.size() || parts[i+1] == ")"
-                        || char_in_string(
-                            operators[operator_index], add_subtract, 2))
+                        i + 1 >= expression.length || tokens[i+1] == CLOSE
+                        || additive >> operator_index & 1)
                 ) {
                     return false;
                 }
                 opened--;
-            } else if (part[0] < '0') {
-                // Operator or parenthesis (less than '0')
-                if (
-                    char_in_string(
-                        operators[operator_index++], add_subtract, 2)
-                ) {
+            } else if (tokens[i] < 0) {
+                // Operator (negative)
+                if (additive >> operator_index++ & 1) {
                     has_add_or_subtract[has_add_or_subtract_index-1] = true;
                 }
             }
-        } else if (part[0] < '0')  {
+        } else if (tokens[i] < 0)  {
             // Increment to the next operator.
             operator_index++;
         }
-        i++;
     }
     return true;
 }
@@ -436,269 +753,1014 @@ std::vector<std::vector<Parentheses>> PARENTHESES[8] = {
 };
 
 
-// Joins parts of an expression and evalutes it.
-// If the result is within the possible target number range, add.
-void check_to_add(std::vector<std::string> &parts, std::set<int> &to_add) {
-    std::string expression = join_strings(parts);
-    // Guaranteed to be integer as no division involved.
-    int result = eval((char*) expression.c_str(), 0, -1);
-    if (result >= 201 && result <= 999) {
-        to_add.insert(result);
+// Expression with parentheses (numbers and operators yet to be set),
+// along with whether check_to_evaluate passes for it with each
+// possible combination of +/- operators (bit per OperatorProduct
+// additive value).
+struct Template {
+    Expression expression;
+    unsigned long long evaluate;
+};
+
+
+// Adds a template of an expression with parentheses, unless there
+// is already a template with exactly the same parentheses.
+void add_template(
+    Expression &expression, std::vector<Template> &templates,
+    std::set<std::vector<int>> &seen
+) {
+    std::vector<int> tokens(
+        expression.tokens, expression.tokens + expression.length);
+    if (!seen.insert(tokens).second) {
+        return;
+    }
+    Template new_template;
+    new_template.expression = expression;
+    new_template.evaluate = 0;
+    for (int additive = 0; additive < 1 << (expression.number_count - 1);
+        additive++
+    ) {
+        if (check_to_evaluate(additive, expression)) {
+            new_template.evaluate |= 1ULL << additive;
+        }
     }
+    templates.push_back(new_template);
 }
 
 
-// For generation of valid/easy numbers.
-// Adds required parentheses to an expression.
-// Handles nested parentheses recursively.
+// Adds parentheses to an expression, adding templates for any
+// nested parentheses inside them recursively (if allowed).
 void add_parentheses(
-    Parentheses &parentheses, std::vector<std::string> &current,
-    std::vector<int> &number_indexes, std::vector<int> &operator_indexes,
-    std::vector<std::string> &operators_product, std::set<int> &to_add
+    Parentheses &parentheses, Expression &current, bool nested,
+    std::vector<Template> &templates, std::set<std::vector<int>> &seen
 ) {
+    int number_count = current.number_count;
     // Opening parentheses
-    current.insert(current.begin() + number_indexes[parentheses.start], "(");
+    insert_token(current, current.number_indexes[parentheses.start], OPEN);
     // Shift indexes to the right.
-    for (int i = parentheses.start; i < number_indexes.size(); i++) {
-        number_indexes[i]++;
+    for (int i = parentheses.start; i <= number_count; i++) {
+        current.number_indexes[i]++;
     }
-    for (int i = parentheses.start; i < operator_indexes.size(); i++) {
-        operator_indexes[i]++;
+    for (int i = parentheses.start; i < number_count - 1; i++) {
+        current.operator_indexes[i]++;
     }
 
     // Closing parentheses
-    current.insert(current.begin() + number_indexes[parentheses.stop]-1, ")");
-    for (int i = parentheses.stop; i < number_indexes.size(); i++) {
-        number_indexes[i]++;
+    insert_token(
+        current, current.number_indexes[parentheses.stop] - 1, CLOSE);
+    for (int i = parentheses.stop; i <= number_count; i++) {
+        current.number_indexes[i]++;
     }
-    for (int i = parentheses.stop - 1; i < operator_indexes.size(); i++) {
-        operator_indexes[i]++;
+    for (int i = parentheses.stop - 1; i < number_count - 1; i++) {
+        current.operator_indexes[i]++;
     }
 
-    if (parentheses.stop - parentheses.start >= 3) {
+    if (nested && parentheses.stop - parentheses.start >= 3) {
         // Nested parentheses
-        std::set<int> new_numbers;
-        std::vector<std::string> deeper_current;
-        std::vector<int> deeper_number_indexes, deeper_operator_indexes;
+        Expression deeper;
         Parentheses add;
         for (
-            std::vector<Parentheses> positions
+            std::vector<Parentheses> &positions
             : PARENTHESES[parentheses.stop - parentheses.start]
         ) {
-            deeper_current = current;
-            deeper_number_indexes = number_indexes;
-            deeper_operator_indexes = operator_indexes;
-
+            deeper = current;
             for (Parentheses p : positions) {
                 add = {
                     p.start + parentheses.start,
                     p.stop + parentheses.start};
-                add_parentheses(
-                    add, deeper_current, deeper_number_indexes,
-                    deeper_operator_indexes, operators_product,
-                    new_numbers);
-            }
-            for (std::string operators : operators_product) {
-                if (!check_to_evaluate(operators, deeper_current)) {
-                    continue;
-                }
-                for (int i = 0; i < operators.length(); i++) {
-                    deeper_current[deeper_operator_indexes[i]] = operators[i];
-                }
-                check_to_add(deeper_current, to_add);
+                add_parentheses(add, deeper, nested, templates, seen);
             }
+            add_template(deeper, templates, seen);
         }
     }
 }
 
 
-// Evaluates numbers using all possible operator positions
-// (Cartesian product), and adds then to a particular set.
-void add(
-    std::vector<int> &numbers,
-    std::vector<std::vector<Parentheses>> &parentheses_positions,
-    std::set<int> &to_add
-) {
-    StartParts start_parts = get_starting_positions(numbers);
-    std::vector<std::string> start = start_parts.start;
-    std::vector<int> start_number_indexes = start_parts.start_number_indexes;
-    std::vector<int>
-        start_operator_indexes = start_parts.start_operator_indexes;
+// Gets every template for n numbers, in the order they are searched:
+// no parentheses first, then each of the parentheses positions.
+std::vector<Template> get_templates(int number_count, bool nested) {
+    std::vector<Template> templates;
+    std::set<std::vector<int>> seen;
+    int numbers[MAX_SOLUTION_NUMBERS] = {0};
+    Expression start = make_expression(numbers, number_count);
+    add_template(start, templates, seen);
+    // Always evaluated, even if parentheses would not be needed.
+    templates[0].evaluate = ~0ULL;
 
-    std::vector<std::string> operators_product =
-        string_product("+-*", numbers.size() - 1);
-    
-    for (std::string operators : operators_product) {
-        for (int i = 0; i < operators.length(); i++) {
-            start[start_operator_indexes[i]] = operators[i];
+    Expression current;
+    for (
+        std::vector<Parentheses> &positions :
+        PARENTHESES[number_count]
+    ) {
+        current = start;
+        for (Parentheses p : positions) {
+            add_parentheses(p, current, nested, templates, seen);
         }
-        check_to_add(start, to_add);
+        add_template(current, templates, seen);
     }
+    return templates;
+}
 
-    std::vector<std::string> current;
-    std::vector<int> number_indexes, operator_indexes;
 
-    for (std::vector<Parentheses> positions : parentheses_positions) {
-        current = start;
-        number_indexes = start_number_indexes;
-        operator_indexes = start_operator_indexes;
+// Templates and operator products for every number count, built once
+// so that a solution search never has to generate them.
+struct TemplateStore {
+    // By number count, then if nested parentheses are allowed.
+    std::vector<Template> templates[MAX_SOLUTION_NUMBERS + 1][2];
+    // By operator subset, then operator count.
+    std::vector<OperatorProduct> operator_products[
+        OPERATOR_SUBSET_COUNT][MAX_SOLUTION_NUMBERS];
+};
 
-        for (Parentheses parentheses : positions) {
-            add_parentheses(
-                parentheses, current, number_indexes,
-                operator_indexes, operators_product, to_add);
-        }
-        for (std::string operators : operators_product) {
-            if (!check_to_evaluate(operators, current)) {
-                continue;
-            }
-            for (int i = 0; i < operators.length(); i++) {
-                current[operator_indexes[i]] = operators[i];
-            }
-            check_to_add(current, to_add);
+
+// Builds the templates and operator products for every number count.
+TemplateStore make_template_store() {
+    TemplateStore store;
+    for (int count = 1; count <= MAX_SOLUTION_NUMBERS; count++) {
+        store.templates[count][0] = get_templates(count, false);
+        store.templates[count][1] = get_templates(count, true);
+    }
+    for (int subset = 0; subset < OPERATOR_SUBSET_COUNT; subset++) {
+        for (int count = 0; count < MAX_SOLUTION_NUMBERS; count++) {
+            store.operator_products[subset][count] = get_operator_products(
+                subset, count);
         }
     }
+    return store;
 }
 
 
-// A number is too easy to get if it is possible to get with
-// 3 or less smaller numbers. Easy numbers will not be generated.
-std::set<int> get_too_easy(std::vector<int> numbers) {
-    std::set<int> too_easy;
-    for (int count = 2; count < 4; count++) {
-        for (std::vector<int> perm : permutations(numbers, count)) {
-            add(perm, PARENTHESES[count], too_easy);
-        }
+// Built once, as soon as the library is loaded.
+const TemplateStore TEMPLATE_STORE = make_template_store();
+
+
+// Counts the numbers in a subset of the numbers (set bits of the mask).
+int subset_size(int mask) {
+    int count = 0;
+    for (; mask; mask &= mask - 1) {
+        count++;
     }
-    return too_easy;
+    return count;
 }
 
 
-// A number is valid if it is possible to get with only 4/7 numbers
-// using +/-/*/().
-// Humans are not computers so some leeway must be allowed.
-std::set<int> get_valid(std::vector<int> numbers) {
-    std::set<int> valid;
-    for (std::vector<int> perm : permutations(numbers, 4)) {
-        add(perm, PARENTHESES[4], valid);
+// Gets the subset equivalent to each subset (as a bitmask) of sorted
+// numbers which only uses the first copies of any repeated number,
+// e.g. the second 25 alone is equivalent to the first 25 alone.
+// An equivalent subset is never numerically greater.
+std::vector<int> get_equivalent_subsets(std::vector<int> &numbers) {
+    int subset_count = 1 << numbers.size();
+    std::vector<int> equivalent(subset_count);
+    for (int mask = 0; mask < subset_count; mask++) {
+        int first = 0;
+        for (int i = 0; i < (int) numbers.size(); i++) {
+            if (i == 0 || numbers[i] != numbers[i - 1]) {
+                first = i;
+            }
+            if (mask & 1 << i) {
+                // Takes the first copy of the number not yet taken.
+                while (equivalent[mask] & 1 << first) {
+                    first++;
+                }
+                equivalent[mask] |= 1 << first;
+            }
+        }
     }
-    return valid;
+    return equivalent;
 }
 
 
-// Gets a random suitable number
-// from 201-999 for the player to try and get.
-int generate_number(int number_array[7], int recent[], int recent_count) {
-    std::vector<int> numbers;
-    for (int i = 0; i < 7; i++) {
-        numbers.push_back(number_array[i]);
-    }
-    std::set<int> recent_set;
-    for (int i = 0; i < recent_count; i++) {
-        recent_set.insert(recent[i]);
-    }
-    std::set<int> valid = get_valid(numbers);
-    std::set<int> too_easy = get_too_easy(numbers);
-    std::set<int> valid_and_not_too_easy;
-    std::set_difference(
-        valid.begin(), valid.end(), too_easy.begin(), too_easy.end(),
-        std::inserter(valid_and_not_too_easy, valid_and_not_too_easy.end()));
+// Value from combining two values with an operator,
+// possibly with the values swapped (b - a, b / a).
+struct Combination {
+    long long value;
+    int operator_token;
+    bool swapped;
+};
 
-    std::vector<int> final_possibilities;
-    std::set_difference(
-        valid_and_not_too_easy.begin(), valid_and_not_too_easy.end(),
-        recent_set.begin(), recent_set.end(),
-        std::inserter(final_possibilities, final_possibilities.end()));
 
-    // Generate random number by index. Uniform probability.
-    return final_possibilities[
-        generate_random_number(0, final_possibilities.size()-1)];
-}
+// Most combinations of two values (see combine_values).
+const int MAX_COMBINATIONS = 6;
 
 
-// Checks if an expression equals target and returns it if true.
-// Or else, an empty string is returned.
-std::string check_expression_equals_target(
-    std::vector<std::string> parts, long double target
+// Gets every value from combining two values with +/-/*,
+// and / without a remainder if division is allowed.
+// If only integers are allowed, every result must be a positive
+// integer, but division without a remainder is always allowed.
+// Returns the number of combinations.
+int combine_values(
+    long long a, long long b, bool integer_only, bool divide,
+    Combination combinations[MAX_COMBINATIONS]
 ) {
-    std::string expression = join_strings(parts);
-    long double value = eval((char*) expression.c_str(), 0, -1);
-    if (value >= target - 0.0000000001 && value <= target + 0.0000000001) {
-        return expression;
+    int count = 0;
+    combinations[count++] = {a + b, ADD, false};
+    combinations[count++] = {a * b, MULTIPLY, false};
+    if (integer_only) {
+        if (a != b) {
+            combinations[count++] = {std::abs(a - b), SUBTRACT, a < b};
+        }
+        if (a % b == 0) {
+            combinations[count++] = {a / b, DIVIDE, false};
+        } else if (b % a == 0) {
+            combinations[count++] = {b / a, DIVIDE, true};
+        }
+        return count;
     }
-    return "";
+    combinations[count++] = {a - b, SUBTRACT, false};
+    combinations[count++] = {b - a, SUBTRACT, true};
+    if (divide && b && a % b == 0) {
+        combinations[count++] = {a / b, DIVIDE, false};
+    }
+    if (divide && a && b % a == 0) {
+        combinations[count++] = {b / a, DIVIDE, true};
+    }
+    return count;
 }
 
 
-// For generation of solutions.
-// Adds required parentheses to an expression.
-// Handles nested parentheses recursively.
-std::string add_parentheses(
-    Parentheses &parentheses, std::vector<std::string> &current,
-    std::vector<int> &number_indexes, std::vector<int> &operator_indexes,
-    std::vector<std::string> &operators_product, int target,
-    int parentheses_setting
+// Gets every value reachable by using all numbers of a subset exactly
+// once with +/-/*/(), for every subset (as a bitmask) of at most
+// max_count numbers, which are sorted first.
+// Subsets not needed are left empty, as are subsets equivalent to
+// another (see get_equivalent_subsets), since repeated numbers would
+// only give the same values again.
+// If only integers are allowed, or division is allowed, see
+// combine_values (intermediate results are always integers).
+// Dynamic programming: a subset's values are built from all its
+// two-way splits into smaller subsets, already computed, since
+// submasks are always numerically smaller than their mask.
+// This covers every expression tree (any parentheses) in one pass.
+std::vector<std::vector<long long>> get_reachable(
+    std::vector<int> numbers, int max_count, bool integer_only,
+    SearchControl &control, bool divide = false
 ) {
-    // Opening parentheses
-    current.insert(current.begin() + number_indexes[parentheses.start], "(");
-    // Shift indexes to the right.
-    for (int i = parentheses.start; i < number_indexes.size(); i++) {
-        number_indexes[i]++;
+    std::sort(numbers.begin(), numbers.end());
+    std::vector<int> equivalent = get_equivalent_subsets(numbers);
+    int subset_count = 1 << numbers.size();
+    std::vector<std::vector<long long>> reachable(subset_count);
+    Combination combinations[MAX_COMBINATIONS];
+    for (int mask = 1; mask < subset_count; mask++) {
+        int size = subset_size(mask);
+        if (size > max_count || equivalent[mask] != mask) {
+            continue;
+        }
+        std::vector<long long> &values = reachable[mask];
+        if (size == 1) {
+            for (int i = 0; i < (int) numbers.size(); i++) {
+                if (mask == 1 << i) {
+                    values.push_back(numbers[i]);
+                }
+            }
+            continue;
+        }
+        // Each split is only considered once - with the lowest
+        // number always on the left (subtraction both ways instead).
+        // Splits only differing by which copies of repeated numbers
+        // go left are skipped too (the right is then made equivalent).
+        int lowest = mask & -mask;
+        for (int left = (mask - 1) & mask; left; left = (left - 1) & mask) {
+            if (!(left & lowest) || equivalent[left] != left) {
+                continue;
+            }
+            int right = equivalent[mask ^ left];
+            for (long long a : reachable[left]) {
+                // Checked per value, since there are only a few subsets.
+                if (should_stop(control)) {
+                    return reachable;
+                }
+                for (long long b : reachable[right]) {
+                    int count = combine_values(
+                        a, b, integer_only, divide, combinations);
+                    for (int i = 0; i < count; i++) {
+                        values.push_back(combinations[i].value);
+                    }
+                }
+            }
+        }
+        std::sort(values.begin(), values.end());
+        values.erase(std::unique(values.begin(), values.end()), values.end());
     }
-    for (int i = parentheses.start; i < operator_indexes.size(); i++) {
-        operator_indexes[i]++;
+    return reachable;
+}
+
+
+// Adds values reachable with exactly n numbers that are also
+// within the possible target number range to a particular set.
+void add_in_range(
+    std::vector<std::vector<long long>> &reachable, int number_count,
+    std::set<int> &to_add
+) {
+    for (int mask = 1; mask < (int) reachable.size(); mask++) {
+        if (subset_size(mask) != number_count) {
+            continue;
+        }
+        for (long long value : reachable[mask]) {
+            if (value >= 201 && value <= 999) {
+                to_add.insert(value);
+            }
+        }
     }
+}
 
-    // Closing parentheses
-    current.insert(current.begin() + number_indexes[parentheses.stop]-1, ")");
-    for (int i = parentheses.stop; i < number_indexes.size(); i++) {
-        number_indexes[i]++;
+
+// A number is too easy to get if it is possible to get with
+// 3 or less smaller numbers. Easy numbers will not be generated.
+std::set<int> get_too_easy(std::vector<std::vector<long long>> &reachable) {
+    std::set<int> too_easy;
+    for (int count = 2; count < 4; count++) {
+        add_in_range(reachable, count, too_easy);
     }
-    for (int i = parentheses.stop - 1; i < operator_indexes.size(); i++) {
-        operator_indexes[i]++;
+    return too_easy;
+}
+
+
+// A number is valid if it is possible to get with only 4/7 numbers
+// using +/-/*/().
+// Humans are not computers so some leeway must be allowed.
+std::set<int> get_valid(std::vector<std::vector<long long>> &reachable) {
+    std::set<int> valid;
+    add_in_range(reachable, 4, valid);
+    return valid;
+}
+
+
+// Gets all valid numbers which are not too easy, in ascending order.
+// If only integers are allowed, see get_reachable.
+std::set<int> get_possible(
+    std::vector<int> &numbers, bool integer_only, SearchControl &control
+) {
+    std::vector<std::vector<long long>> reachable = get_reachable(
+        numbers, 4, integer_only, control);
+    std::set<int> valid = get_valid(reachable);
+    std::set<int> too_easy = get_too_easy(reachable);
+    std::set<int> valid_and_not_too_easy;
+    std::set_difference(
+        valid.begin(), valid.end(), too_easy.begin(), too_easy.end(),
+        std::inserter(valid_and_not_too_easy, valid_and_not_too_easy.end()));
+    return valid_and_not_too_easy;
+}
+
+
+// Gets a random suitable number
+// from 201-999 for the player to try and get.
+// If only integers are allowed, the number must be possible
+// without fractions or negatives (see get_reachable).
+// Returns a negative status instead if cancelled or timed out.
+int generate_number(
+    int number_array[7], int recent[], int recent_count,
+    int *cancel, long long deadline_ns, int integer_only
+) {
+    std::vector<int> numbers;
+    for (int i = 0; i < 7; i++) {
+        numbers.push_back(number_array[i]);
+    }
+    std::set<int> recent_set;
+    for (int i = 0; i < recent_count; i++) {
+        recent_set.insert(recent[i]);
+    }
+    SearchControl control = make_search_control(cancel, deadline_ns);
+    std::set<int> valid_and_not_too_easy = get_possible(
+        numbers, integer_only, control);
+    if (control.status) {
+        return control.status;
     }
 
-    if (parentheses_setting && parentheses.stop - parentheses.start >= 3) {
-        // Nested parentheses
-        std::string result;
-        std::vector<std::string> deeper_current;
-        std::vector<int> deeper_number_indexes, deeper_operator_indexes;
-        Parentheses add;
-        for (
-            std::vector<Parentheses> positions
-            : PARENTHESES[parentheses.stop - parentheses.start]
-        ) {
-            deeper_current = current;
-            deeper_number_indexes = number_indexes;
-            deeper_operator_indexes = operator_indexes;
+    std::vector<int> final_possibilities;
+    std::set_difference(
+        valid_and_not_too_easy.begin(), valid_and_not_too_easy.end(),
+        recent_set.begin(), recent_set.end(),
+        std::inserter(final_possibilities, final_possibilities.end()));
 
-            for (Parentheses p : positions) {
-                add = {
-                    p.start + parentheses.start,
-                    p.stop + parentheses.start};
-                result = add_parentheses(
-                    add, deeper_current, deeper_number_indexes,
-                    deeper_operator_indexes, operators_product,
-                    target, parentheses_setting);
-                if (result != "") {
-                    return result;
+    // Generate random number by index. Uniform probability.
+    return final_possibilities[
+        generate_random_number(0, final_possibilities.size()-1)];
+}
+
+
+// Writes all possible target numbers (valid and not too easy)
+// into an array with space for 799 numbers (201-999).
+// Returns the count of possible target numbers.
+int get_possible_numbers(
+    int number_array[7], int possible[], int integer_only
+) {
+    std::vector<int> numbers;
+    for (int i = 0; i < 7; i++) {
+        numbers.push_back(number_array[i]);
+    }
+    SearchControl control = make_search_control(NULL, 0);
+    int count = 0;
+    for (int number : get_possible(numbers, integer_only, control)) {
+        possible[count++] = number;
+    }
+    return count;
+}
+
+
+// Every value in a range (min-max) reachable with the numbers,
+// with 2 entries per value: the fewest numbers needed (0 if not
+// reachable), and where its witness expression using that many
+// numbers starts in the arena (-1 if not reachable).
+// Witnesses are C strings one after another in the arena.
+struct ReachabilityMap {
+    int min_value;
+    int max_value;
+    std::vector<int> entries;
+    std::string arena;
+};
+
+
+// Expression for a reachable value (see get_witness), along with
+// its last operator (0 for a number) to know where parentheses go.
+struct Witness {
+    std::string text;
+    int operator_token;
+};
+
+
+// Subset values of sorted numbers (see get_reachable), along with what
+// is needed to find how a value was reached.
+struct ReachableValues {
+    std::vector<int> numbers;
+    std::vector<int> equivalent;
+    std::vector<std::vector<long long>> values;
+    bool integer_only;
+    bool divide;
+};
+
+
+// Gets the text of an operand of an operator, in parentheses if needed.
+std::string get_operand_text(
+    Witness &operand, int operator_token, bool right
+) {
+    bool needs_parentheses;
+    if (!operand.operator_token || operator_token == ADD) {
+        needs_parentheses = false;
+    } else if (!right) {
+        needs_parentheses = (
+            !is_multiply_or_divide(operand.operator_token)
+            && is_multiply_or_divide(operator_token));
+    } else {
+        needs_parentheses = (
+            operator_token == DIVIDE
+            || !is_multiply_or_divide(operand.operator_token));
+    }
+    return needs_parentheses ? "(" + operand.text + ")" : operand.text;
+}
+
+
+// Finds how a value of a subset (as a bitmask) is reached, by finding
+// a split and a value of each side which combine to it
+// (see get_reachable), recursively. Values of the other side are
+// looked up rather than trying every pair.
+Witness get_witness(ReachableValues &reachable, int mask, long long value) {
+    if (!(mask & (mask - 1))) {
+        return {std::to_string(reachable.numbers[__builtin_ctz(mask)]), 0};
+    }
+    Combination combinations[MAX_COMBINATIONS];
+    int lowest = mask & -mask;
+    for (int left = (mask - 1) & mask; left; left = (left - 1) & mask) {
+        if (!(left & lowest) || reachable.equivalent[left] != left) {
+            continue;
+        }
+        int right = reachable.equivalent[mask ^ left];
+        std::vector<long long> &right_values = reachable.values[right];
+        for (long long a : reachable.values[left]) {
+            // Only values of the other side which could possibly
+            // combine with a to give the value.
+            std::vector<long long> candidates = {
+                value - a, a - value, value + a, value * a};
+            if (a && value % a == 0) {
+                candidates.push_back(value / a);
+            }
+            if (value && a % value == 0) {
+                candidates.push_back(a / value);
+            }
+            if (!value && !a && !right_values.empty()) {
+                candidates.push_back(right_values[0]);
+            }
+            for (long long b : candidates) {
+                if (!std::binary_search(
+                    right_values.begin(), right_values.end(), b)
+                ) {
+                    continue;
+                }
+                int count = combine_values(
+                    a, b, reachable.integer_only, reachable.divide,
+                    combinations);
+                for (int i = 0; i < count; i++) {
+                    Combination &combination = combinations[i];
+                    if (combination.value != value) {
+                        continue;
+                    }
+                    Witness first = get_witness(reachable, left, a);
+                    Witness second = get_witness(reachable, right, b);
+                    if (combination.swapped) {
+                        std::swap(first, second);
+                    }
+                    int token = combination.operator_token;
+                    return {
+                        get_operand_text(first, token, false)
+                        + token_to_string(token)
+                        + get_operand_text(second, token, true), token};
                 }
             }
+        }
+    }
+    return {"", 0};
+}
+
+
+// Gets every value in a range reachable with the numbers (any subset),
+// along with the fewest numbers needed and a witness expression
+// (see ReachabilityMap). Division without a remainder is allowed,
+// but intermediate results are always integers (see get_reachable).
+// Returns false if the search stopped early (see the control status).
+bool make_reachability_map(
+    std::vector<int> &numbers, bool integer_only, SearchControl &control,
+    ReachabilityMap &map
+) {
+    ReachableValues reachable;
+    reachable.numbers = numbers;
+    std::sort(reachable.numbers.begin(), reachable.numbers.end());
+    reachable.equivalent = get_equivalent_subsets(reachable.numbers);
+    reachable.integer_only = integer_only;
+    reachable.divide = true;
+    reachable.values = get_reachable(
+        numbers, numbers.size(), integer_only, control, true);
+    if (control.status) {
+        return false;
+    }
 
-            for (std::string operators : operators_product) {
-                if (!check_to_evaluate(operators, deeper_current)) {
+    int value_count = map.max_value - map.min_value + 1;
+    map.entries.assign(value_count * 2, 0);
+    for (int i = 0; i < value_count; i++) {
+        map.entries[i * 2 + 1] = -1;
+    }
+    // Subsets with fewer numbers first, so the fewest needed is found.
+    for (int size = 1; size <= (int) numbers.size(); size++) {
+        for (int mask = 1; mask < (int) reachable.values.size(); mask++) {
+            if (subset_size(mask) != size) {
+                continue;
+            }
+            std::vector<long long> &values = reachable.values[mask];
+            for (
+                auto value = std::lower_bound(
+                    values.begin(), values.end(), map.min_value);
+                value != values.end() && *value <= map.max_value; value++
+            ) {
+                int index = (*value - map.min_value) * 2;
+                if (map.entries[index]) {
                     continue;
                 }
-                for (int i = 0; i < operators.length(); i++) {
-                    deeper_current[deeper_operator_indexes[i]] = operators[i];
+                map.entries[index] = size;
+                map.entries[index + 1] = map.arena.size();
+                map.arena += get_witness(reachable, mask, *value).text;
+                map.arena += '\0';
+            }
+        }
+    }
+    return true;
+}
+
+
+// Creates the reachability map of some numbers over a range of values
+// (see make_reachability_map), which must be freed once no longer
+// needed. Returns NULL if cancelled or timed out instead.
+void *create_reachability_map(
+    int number_array[], int number_count, int min_value, int max_value,
+    int integer_only, int *cancel, long long deadline_ns
+) {
+    std::vector<int> numbers(number_array, number_array + number_count);
+    SearchControl control = make_search_control(cancel, deadline_ns);
+    ReachabilityMap *map = new ReachabilityMap;
+    map->min_value = min_value;
+    map->max_value = max_value;
+    if (!make_reachability_map(numbers, integer_only, control, *map)) {
+        delete map;
+        return NULL;
+    }
+    return map;
+}
+
+
+// The entries of a reachability map (2 per value, see ReachabilityMap).
+int *get_reachability_entries(void *map) {
+    return ((ReachabilityMap*) map)->entries.data();
+}
+
+
+// The witness expressions of a reachability map (see ReachabilityMap).
+char *get_reachability_arena(void *map) {
+    return (char*) ((ReachabilityMap*) map)->arena.data();
+}
+
+
+int get_reachability_arena_size(void *map) {
+    return ((ReachabilityMap*) map)->arena.size();
+}
+
+
+void free_reachability_map(void *map) {
+    delete (ReachabilityMap*) map;
+}
+
+
+// Subsets of at most this many numbers have all their values counted
+// up front when estimating difficulty (see TreeCounts), which is fast.
+// Any bigger subset can always be split with one side this small.
+const int COUNTED_SUBSET_SIZE = 5;
+
+
+// Expression trees of subsets (as bitmasks) of sorted numbers,
+// only with positive integer intermediate results (as in the real
+// game), split as in get_reachable, each operator being a distinct tree:
+// - For small subsets: every value reached, with how many trees reach it
+// (sorted by value).
+// - Trees reaching particular values of bigger subsets, once counted.
+// - All trees of each subset, any operator at each node, even if
+// invalid (as if every operator could always be used).
+struct TreeCounts {
+    std::vector<int> numbers;
+    std::vector<int> equivalent;
+    std::vector<std::vector<std::pair<long long, long long>>> values;
+    std::map<std::pair<int, long long>, long long> counted;
+    std::vector<long long> totals;
+};
+
+
+// Counts the trees of every small subset by value, and all trees
+// of every subset (see TreeCounts).
+void count_small_subset_trees(TreeCounts &counts) {
+    int subset_count = 1 << counts.numbers.size();
+    counts.values.assign(subset_count, {});
+    counts.totals.assign(subset_count, 0);
+    Combination combinations[MAX_COMBINATIONS];
+    for (int mask = 1; mask < subset_count; mask++) {
+        if (counts.equivalent[mask] != mask) {
+            continue;
+        }
+        int size = subset_size(mask);
+        if (size == 1) {
+            counts.values[mask].push_back(
+                {counts.numbers[__builtin_ctz(mask)], 1});
+            counts.totals[mask] = 1;
+            continue;
+        }
+        std::vector<std::pair<long long, long long>> values;
+        int lowest = mask & -mask;
+        for (int left = (mask - 1) & mask; left; left = (left - 1) & mask) {
+            if (!(left & lowest) || counts.equivalent[left] != left) {
+                continue;
+            }
+            int right = counts.equivalent[mask ^ left];
+            counts.totals[mask] += (
+                counts.totals[left] * counts.totals[right] * 4);
+            if (size > COUNTED_SUBSET_SIZE) {
+                continue;
+            }
+            for (auto &a : counts.values[left]) {
+                for (auto &b : counts.values[right]) {
+                    int count = combine_values(
+                        a.first, b.first, true, true, combinations);
+                    for (int i = 0; i < count; i++) {
+                        values.push_back(
+                            {combinations[i].value, a.second * b.second});
+                    }
+                }
+            }
+        }
+        // Merges the trees reaching the same value.
+        std::sort(values.begin(), values.end());
+        std::vector<std::pair<long long, long long>> &merged = (
+            counts.values[mask]);
+        for (auto &entry : values) {
+            if (!merged.empty() && merged.back().first == entry.first) {
+                merged.back().second += entry.second;
+            } else {
+                merged.push_back(entry);
+            }
+        }
+    }
+}
+
+
+// Counts the trees of a subset (as a bitmask) reaching a value
+// (see TreeCounts). Bigger subsets are split, and for each value
+// of the smaller side, only the values of the other side which could
+// possibly combine with it to give the value are counted, recursively.
+long long count_trees(TreeCounts &counts, int mask, long long value) {
+    if (value <= 0) {
+        return 0;
+    }
+    if (subset_size(mask) <= COUNTED_SUBSET_SIZE) {
+        std::vector<std::pair<long long, long long>> &values = (
+            counts.values[mask]);
+        auto found = std::lower_bound(
+            values.begin(), values.end(), std::make_pair(value, 0LL));
+        return (
+            found != values.end() && found->first == value
+            ? found->second : 0);
+    }
+    auto counted = counts.counted.find({mask, value});
+    if (counted != counts.counted.end()) {
+        return counted->second;
+    }
+    long long trees = 0;
+    Combination combinations[MAX_COMBINATIONS];
+    int lowest = mask & -mask;
+    for (int left = (mask - 1) & mask; left; left = (left - 1) & mask) {
+        if (!(left & lowest) || counts.equivalent[left] != left) {
+            continue;
+        }
+        int right = counts.equivalent[mask ^ left];
+        bool left_smaller = subset_size(left) <= subset_size(right);
+        int smaller = left_smaller ? left : right;
+        int other = left_smaller ? right : left;
+        for (auto &entry : counts.values[smaller]) {
+            long long a = entry.first;
+            std::vector<long long> candidates = {
+                value - a, a - value, value + a, value * a};
+            if (value % a == 0) {
+                candidates.push_back(value / a);
+            }
+            if (a % value == 0) {
+                candidates.push_back(a / value);
+            }
+            std::sort(candidates.begin(), candidates.end());
+            candidates.erase(
+                std::unique(candidates.begin(), candidates.end()),
+                candidates.end());
+            for (long long b : candidates) {
+                long long b_trees = count_trees(counts, other, b);
+                if (!b_trees) {
+                    continue;
                 }
-                result = check_expression_equals_target(deeper_current, target);
-                if (result != "") {
-                    return result;
+                // The smaller side may be on either side of the operator.
+                int count = left_smaller
+                    ? combine_values(a, b, true, true, combinations)
+                    : combine_values(b, a, true, true, combinations);
+                for (int i = 0; i < count; i++) {
+                    if (combinations[i].value == value) {
+                        trees += entry.second * b_trees;
+                    }
                 }
             }
         }
     }
+    counts.counted[{mask, value}] = trees;
+    return trees;
+}
+
+
+// Estimates how hard it is to reach a target with the numbers
+// (any subset), from expression trees with positive integer
+// intermediate results (see TreeCounts):
+// - The number of trees reaching the target.
+// - The fewest numbers needed (0 if not reachable).
+// - The fraction of all trees which reach the target, i.e. the chance
+// of a random expression (random operators) reaching it.
+void estimate_difficulty(
+    int number_array[], int number_count, int target,
+    long long *solution_count, int *min_number_count, double *fraction
+) {
+    TreeCounts counts;
+    counts.numbers.assign(number_array, number_array + number_count);
+    std::sort(counts.numbers.begin(), counts.numbers.end());
+    counts.equivalent = get_equivalent_subsets(counts.numbers);
+    count_small_subset_trees(counts);
+
+    *solution_count = 0;
+    *min_number_count = 0;
+    long long total = 0;
+    for (int mask = 1; mask < (int) counts.totals.size(); mask++) {
+        if (counts.equivalent[mask] != mask) {
+            continue;
+        }
+        total += counts.totals[mask];
+        long long trees = count_trees(counts, mask, target);
+        *solution_count += trees;
+        int size = subset_size(mask);
+        if (trees && (!*min_number_count || size < *min_number_count)) {
+            *min_number_count = size;
+        }
+    }
+    *fraction = (double) *solution_count / total;
+}
+
+
+// Adds a part to a sum or product in canonical form,
+// flattening it into the parts if it is the same type of operation.
+void add_canonical_part(CanonicalForm &form, CanonicalForm &part, int sign) {
+    if (part.type == form.type) {
+        for (std::pair<int, std::string> &inner : part.parts) {
+            form.parts.push_back({inner.first * sign, inner.second});
+        }
+    } else {
+        form.parts.push_back({sign, part.text});
+    }
+}
+
+
+CanonicalForm get_canonical_form(char expression[], int &i, char type);
+
+
+// Gets the canonical form of a number or parenthesised expression,
+// starting at index i and moving i past it.
+CanonicalForm get_canonical_operand(char expression[], int &i) {
+    if (expression[i] == '(') {
+        i++;
+        CanonicalForm form = get_canonical_form(expression, i, '+');
+        i++; // Closing parenthesis.
+        return form;
+    }
+    CanonicalForm form = {'n', "", {}};
+    while (expression[i] >= '0') {
+        form.text += expression[i++];
+    }
+    return form;
+}
+
+
+// Gets the canonical form of a sum ('+') or product ('*') from index i,
+// moving i past it. If there is only a single term/factor,
+// its own canonical form is returned.
+CanonicalForm get_canonical_form(char expression[], int &i, char type) {
+    char inverse = type == '+' ? '-' : '/';
+    CanonicalForm first = type == '+' ?
+        get_canonical_form(expression, i, '*')
+        : get_canonical_operand(expression, i);
+    if (expression[i] != type && expression[i] != inverse) {
+        return first;
+    }
+    CanonicalForm form = {type, "", {}};
+    add_canonical_part(form, first, 1);
+    while (expression[i] == type || expression[i] == inverse) {
+        int sign = expression[i++] == type ? 1 : -1;
+        CanonicalForm next = type == '+' ?
+            get_canonical_form(expression, i, '*')
+            : get_canonical_operand(expression, i);
+        add_canonical_part(form, next, sign);
+    }
+    std::sort(form.parts.begin(), form.parts.end());
+    form.text = type;
+    form.text += '(';
+    for (std::pair<int, std::string> &part : form.parts) {
+        form.text += part.first > 0 ? '+' : '-';
+        form.text += part.second + ',';
+    }
+    form.text += ')';
+    return form;
+}
+
+
+// Gets the canonical text of an expression (see CanonicalForm).
+std::string get_canonical_text(char expression[]) {
+    int i = 0;
+    return get_canonical_form(expression, i, '+').text;
+}
+
+
+// Adds the canonical form of a solution to a solution set.
+// Returns false if an equivalent solution was already in the set.
+bool add_solution(SolutionSet *found, char expression[]) {
+    std::string text = get_canonical_text(expression);
+    std::lock_guard<std::mutex> lock(found->mutex);
+    return found->forms.insert(text).second;
+}
+
+
+// Checks if a value is exactly the target.
+bool equals_target(Rational &value, long double target) {
+    return !value.status && value.denominator == 1
+        && value.numerator == target;
+}
+
+
+// Checks if the value of an expression should become the nearest:
+// tracked, a whole number and closer to the target than before.
+bool is_nearest(Nearest &nearest, Rational &value, long double target) {
+    return (
+        nearest.track && !value.status && value.denominator == 1
+        && std::abs(value.numerator - target) < nearest.distance);
+}
+
+
+// Notes a new nearest expression (see is_nearest).
+void set_nearest(
+    Nearest &nearest, Rational &value, long double target,
+    std::string expression
+) {
+    nearest.distance = std::abs(value.numerator - target);
+    nearest.value = value.numerator;
+    nearest.expression = expression;
+}
+
+
+// Checks if a canonical form (see get_canonical_text) is already
+// in a solution set, without adding it.
+bool has_solution(SolutionSet *found, std::string &text) {
+    std::lock_guard<std::mutex> lock(found->mutex);
+    return found->forms.count(text);
+}
+
+
+// Checks if a solution is new if there is a solution set (not NULL),
+// adding it to the set. Solutions are always new without a set.
+bool is_new_solution(SolutionSet *found, std::string &solution) {
+    return found == NULL || add_solution(found, (char*) solution.c_str());
+}
+
+
+// Called with each solution found by a search which does not stop at
+// the first solution, until it returns non-zero.
+typedef int (*SolutionCallback)(const char *solution);
+
+
+// State of a template search (see find_solution).
+struct TemplateSearch {
+    bool integer_only;
+    long double target;
+    SearchControl *control;
+    Nearest *nearest;
+    SolutionSet *found;
+    // Only set (not NULL) if every solution is wanted.
+    SolutionCallback callback;
+    int solution_count;
+    bool stopped; // By the callback.
+    // Only set (not NULL) if solutions are sampled (see add_to_sample),
+    // in which case found is only used to skip known solutions.
+    std::vector<std::string> *sample;
+    int sample_size;
+    // Canonical forms of the distinct solutions seen by this search.
+    std::set<std::string> *seen_forms;
+    long long solutions_seen;
+    std::mt19937 *rng;
+};
+
+
+// Reservoir sampling: the nth solution seen replaces a random solution
+// in the sample with probability k/n (once the sample has k solutions),
+// so every solution is equally likely to be in the final sample
+// without storing more than k solutions.
+// Only the first form of each distinct solution is counted, so
+// solutions with many equivalent forms are not favoured, and
+// solutions equivalent to one already found are never sampled.
+void add_to_sample(TemplateSearch &search, std::string &solution) {
+    std::string text = get_canonical_text((char*) solution.c_str());
+    if (search.found != NULL && has_solution(search.found, text)) {
+        return;
+    }
+    if (!search.seen_forms->insert(text).second) {
+        return;
+    }
+    search.solutions_seen++;
+    std::vector<std::string> &sample = *search.sample;
+    if ((int) sample.size() < search.sample_size) {
+        sample.push_back(solution);
+        return;
+    }
+    std::uniform_int_distribution<long long> random_index(
+        0, search.solutions_seen - 1);
+    long long index = random_index(*search.rng);
+    if (index < search.sample_size) {
+        sample[index] = solution;
+    }
+}
+
+
+// Checks if an expression equals target and returns it if true.
+// Or else, an empty string is returned, noting the expression
+// if it is the nearest to the target so far.
+// If a solution set is provided (not NULL), solutions equivalent
+// to one already found are not returned, so the search continues.
+// Expressions are evaluated exactly, or if only integers are allowed,
+// expressions breaking the rule are never solutions (or the nearest).
+std::string check_expression_equals_target(
+    Expression &expression, TemplateSearch &search
+) {
+    Rational value;
+    if (search.integer_only) {
+        long long integer = evaluate_integer(expression);
+        if (!integer) {
+            return "";
+        }
+        value = make_rational(integer);
+    } else {
+        value = evaluate_exact(expression.tokens, expression.length);
+    }
+    if (equals_target(value, search.target)) {
+        std::string solution = expression_to_string(expression);
+        if (search.sample != NULL) {
+            // Only known solutions are skipped (see add_to_sample).
+            return solution;
+        }
+        return is_new_solution(search.found, solution) ? solution : "";
+    }
+    if (is_nearest(*search.nearest, value, search.target)) {
+        set_nearest(
+            *search.nearest, value, search.target,
+            expression_to_string(expression));
+    }
     return "";
 }
 
@@ -711,81 +1773,692 @@ void write_solution(std::string solution, char filename[]) {
 }
 
 
+// Searches every template (parentheses positions) allowed with every
+// operator product for given numbers in that particular order,
+// starting from a particular operator product (by index).
+// Returns the first solution, or if there is a callback, calls it with
+// each solution instead and returns an empty string.
+// An empty string is also returned if the search stopped early
+// (see the control status).
+std::string search_templates(
+    int numbers_array[], int number_count, int parentheses_setting,
+    const std::vector<OperatorProduct> &products, int offset,
+    TemplateSearch &search
+) {
+    const std::vector<Template> &templates =
+        TEMPLATE_STORE.templates[number_count][parentheses_setting > 0];
+    // Only the first template has no parentheses.
+    int template_count = parentheses_setting == -1 ? 1 : templates.size();
+    int product_count = products.size();
+
+    std::string result;
+    Expression current;
+    for (int t = 0; t < template_count; t++) {
+        current = templates[t].expression;
+        for (int i = 0; i < number_count; i++) {
+            current.tokens[current.number_indexes[i]] = numbers_array[i];
+        }
+        for (int i = 0; i < product_count; i++) {
+            if (should_stop(*search.control)) {
+                return "";
+            }
+            int index = offset + i;
+            const OperatorProduct &operators = products[
+                index < product_count ? index : index - product_count];
+            if (!(templates[t].evaluate >> operators.additive & 1)) {
+                continue;
+            }
+            set_operators(current, operators);
+            result = check_expression_equals_target(current, search);
+            if (result == "") {
+                continue;
+            }
+            if (search.sample != NULL) {
+                add_to_sample(search, result);
+                continue;
+            }
+            if (search.callback == NULL) {
+                return result;
+            }
+            search.solution_count++;
+            if (search.callback(result.c_str())) {
+                search.stopped = true;
+                return "";
+            }
+        }
+    }
+    return "";
+}
+
+
 // Attempts to find a solution for given numbers
 // in that particular order along with the target number,
 // parentheses positions and operators which can be used.
-void get_solution(
+// If only integers are allowed, every intermediate result
+// must be a positive integer.
+// Returns an empty string if there is no solution
+// or the search stopped early (see the control status).
+std::string find_solution(
     int numbers_array[], int number_count, int target,
-    char operators_c_str[], int parentheses_setting, char filename[]
+    char operators_c_str[], int parentheses_setting, bool integer_only,
+    SearchControl &control, Nearest &nearest, SolutionSet *found
 ) {
-    std::vector<int> numbers;
-    for (int i = 0; i < number_count; i++) {
-        numbers.push_back(numbers_array[i]);
-    }
-    std::string operators = operators_c_str;
-
-    StartParts start_parts = get_starting_positions(numbers);
-    std::vector<std::string> start = start_parts.start;
-    std::vector<int> start_number_indexes = start_parts.start_number_indexes;
-    std::vector<int>
-        start_operator_indexes = start_parts.start_operator_indexes;
-    
-    std::vector<std::string> operators_product = string_product(
-        operators, number_count-1);
-    std::rotate(
-        operators_product.begin(),
-        operators_product.begin() + generate_random_number(
-            0, operators_product.size()-1),
-        operators_product.end());
-    
-    std::string result;
-    
-    for (std::string operators : operators_product) {
-        for (int i = 0; i < operators.length(); i++) {
-            start[start_operator_indexes[i]] = operators[i];
+    if (number_count < 1 || number_count > MAX_SOLUTION_NUMBERS) {
+        return "";
+    }
+    const std::vector<OperatorProduct> &products =
+        TEMPLATE_STORE.operator_products[
+            get_operator_subset(operators_c_str)][number_count - 1];
+    if (products.empty()) {
+        return "";
+    }
+    TemplateSearch search;
+    search.integer_only = integer_only;
+    search.target = target;
+    search.control = &control;
+    search.nearest = &nearest;
+    search.found = found;
+    search.callback = NULL;
+    search.sample = NULL;
+    // Operators are searched from a random starting point.
+    return search_templates(
+        numbers_array, number_count, parentheses_setting, products,
+        generate_random_number(0, products.size() - 1), search);
+}
+
+
+// Samples up to n solutions uniformly at random from every solution
+// for given numbers in that particular order (see find_solution),
+// searching every template and operator product.
+// If a solution set is provided (not NULL), solutions equivalent to any
+// in the set are never sampled, and the sample is added to the set
+// (skipping any solution equivalent to another in the sample).
+// Returns the solutions in random order, one per line, or an empty
+// string if there is none or the search stopped early.
+std::string find_sample(
+    int numbers_array[], int number_count, int target,
+    char operators_c_str[], int parentheses_setting, bool integer_only,
+    int sample_size, SearchControl &control, Nearest &nearest,
+    SolutionSet *found
+) {
+    if (number_count < 1 || number_count > MAX_SOLUTION_NUMBERS) {
+        return "";
+    }
+    const std::vector<OperatorProduct> &products =
+        TEMPLATE_STORE.operator_products[
+            get_operator_subset(operators_c_str)][number_count - 1];
+    if (products.empty() || sample_size < 1) {
+        return "";
+    }
+    std::random_device device;
+    std::mt19937 rng(device());
+    std::vector<std::string> sample;
+    std::set<std::string> seen_forms;
+    TemplateSearch search;
+    search.integer_only = integer_only;
+    search.target = target;
+    search.control = &control;
+    search.nearest = &nearest;
+    search.found = found;
+    search.callback = NULL;
+    search.sample = &sample;
+    search.sample_size = sample_size;
+    search.seen_forms = &seen_forms;
+    search.solutions_seen = 0;
+    search.rng = &rng;
+    search_templates(
+        numbers_array, number_count, parentheses_setting, products, 0,
+        search);
+    if (control.status) {
+        // Not uniform unless every solution was seen.
+        return "";
+    }
+
+    std::shuffle(sample.begin(), sample.end(), rng);
+    std::string solutions;
+    for (std::string &solution : sample) {
+        if (!is_new_solution(found, solution)) {
+            continue;
         }
-        result = check_expression_equals_target(start, target);
-        if (result != "") {
-            write_solution(result, filename);
-            return;
+        if (solutions != "") {
+            solutions += "\n";
         }
+        solutions += solution;
     }
-    if (parentheses_setting == -1) {
+    return solutions;
+}
+
+
+// Adds every distinct combination of n sorted numbers (repeated numbers
+// are interchangeable) from a starting index onwards.
+void add_combinations(
+    std::vector<int> &numbers, int start, int count,
+    std::vector<int> &current, std::vector<std::vector<int>> &combinations
+) {
+    if (!count) {
+        combinations.push_back(current);
         return;
     }
+    for (int i = start; i + count <= (int) numbers.size(); i++) {
+        if (i > start && numbers[i] == numbers[i - 1]) {
+            // Same as the combinations with the previous copy.
+            continue;
+        }
+        current.push_back(numbers[i]);
+        add_combinations(numbers, i + 1, count - 1, current, combinations);
+        current.pop_back();
+    }
+}
 
-    std::vector<std::string> current;
-    std::vector<int> number_indexes, operator_indexes;
 
-    for (
-        std::vector<Parentheses> positions :
-        generate_parentheses_positions(number_count)
+// Searches every distinct permutation of n numbers (for each count
+// allowed) with every template and operator product, calling back with
+// each solution (see search_templates), never equivalent to another.
+// Returns the solution count, or the control status if stopped early.
+int find_all_solutions(
+    std::vector<int> numbers, int min_count, int max_count, int target,
+    char operators_c_str[], int parentheses_setting, bool integer_only,
+    SolutionCallback callback, SearchControl &control, SolutionSet *found
+) {
+    std::sort(numbers.begin(), numbers.end());
+    int subset = get_operator_subset(operators_c_str);
+    Nearest nearest = {false, 0, 0, ""};
+    TemplateSearch search;
+    search.integer_only = integer_only;
+    search.target = target;
+    search.control = &control;
+    search.nearest = &nearest;
+    search.found = found;
+    search.callback = callback;
+    search.solution_count = 0;
+    search.stopped = false;
+    search.sample = NULL;
+
+    max_count = std::min(
+        max_count, std::min((int) numbers.size(), MAX_SOLUTION_NUMBERS));
+    for (int count = std::max(min_count, 1); count <= max_count; count++) {
+        const std::vector<OperatorProduct> &products =
+            TEMPLATE_STORE.operator_products[subset][count - 1];
+        if (products.empty()) {
+            break;
+        }
+        std::vector<int> current;
+        std::vector<std::vector<int>> combinations;
+        add_combinations(numbers, 0, count, current, combinations);
+        for (std::vector<int> &permutation : combinations) {
+            // Sorted, so every distinct permutation follows.
+            do {
+                search_templates(
+                    permutation.data(), count, parentheses_setting,
+                    products, 0, search);
+                if (search.stopped) {
+                    return search.solution_count;
+                }
+                if (control.status) {
+                    return control.status;
+                }
+            } while (
+                std::next_permutation(permutation.begin(), permutation.end()));
+        }
+    }
+    return search.solution_count;
+}
+
+
+// Value in a pairwise search: either one of the numbers,
+// or two earlier values (by index) combined with an operator.
+struct PairwiseValue {
+    Rational value;
+    int operator_token; // 0 for a number.
+    int left;
+    int right;
+};
+
+
+// State of a pairwise search (see find_pairwise_solution).
+struct PairwiseSearch {
+    PairwiseValue values[MAX_SOLUTION_NUMBERS * 2];
+    std::string operators;
+    bool integer_only;
+    long double target;
+    SearchControl *control;
+    Nearest *nearest;
+    SolutionSet *found;
+    // Solutions found so far, up to a maximum.
+    std::vector<std::string> solutions;
+    int max_solutions;
+};
+
+
+// Converts a value of a pairwise search into an expression string,
+// only adding the parentheses which are needed.
+std::string pairwise_to_string(PairwiseSearch &search, int index) {
+    PairwiseValue &value = search.values[index];
+    if (!value.operator_token) {
+        return std::to_string(value.value.numerator);
+    }
+    int left_token = search.values[value.left].operator_token;
+    int right_token = search.values[value.right].operator_token;
+    bool left_parentheses = (
+        is_multiply_or_divide(value.operator_token)
+        && (left_token == ADD || left_token == SUBTRACT));
+    bool right_parentheses = right_token && (
+        value.operator_token == DIVIDE || (
+            value.operator_token != ADD
+            && (right_token == ADD || right_token == SUBTRACT)));
+    std::string left = pairwise_to_string(search, value.left);
+    std::string right = pairwise_to_string(search, value.right);
+    if (left_parentheses) {
+        left = "(" + left + ")";
+    }
+    if (right_parentheses) {
+        right = "(" + right + ")";
+    }
+    return left + token_to_string(value.operator_token) + right;
+}
+
+
+// Checks if a rational is 1.
+bool is_one(Rational &value) {
+    return value.numerator == 1 && value.denominator == 1;
+}
+
+
+// Checks if a rational is less than another.
+bool is_less(Rational &a, Rational &b) {
+    return (long double) a.numerator * b.denominator
+        < (long double) b.numerator * a.denominator;
+}
+
+
+// Status of a combination which is pruned (see combine).
+const int COMBINATION_PRUNED = 3;
+
+
+// Combines two values with an operator, returning an invalid result
+// if the combination is pruned (see combine_pairs).
+Rational combine(int token, Rational a, Rational b, bool integer_only) {
+    Rational result = {0, 1, COMBINATION_PRUNED};
+    if (
+        is_multiply_or_divide(token)
+        && (is_one(b) || (token == MULTIPLY && is_one(a)))
     ) {
-        current = start;
-        number_indexes = start_number_indexes;
-        operator_indexes = start_operator_indexes;
+        return result;
+    }
+    if (token == ADD || token == SUBTRACT) {
+        result = add_rationals(a, b, token == ADD);
+    } else {
+        result = multiply_rationals(a, b, token == DIVIDE);
+    }
+    if (
+        !result.status && (
+            result.numerator <= 0
+            || (integer_only && result.denominator != 1))
+    ) {
+        result.status = COMBINATION_PRUNED;
+    }
+    return result;
+}
 
-        for (Parentheses p : positions) {
-            result = add_parentheses(
-                p, current, number_indexes, operator_indexes,
-                operators_product, target, parentheses_setting);
-            if (result != "") {
-                write_solution(result, filename);
-                return;
+
+// Recursively combines two values of the pool at a time, until
+// a single value (using every number) is left to compare to the target.
+// Solutions are collected in the search, and the last one is returned
+// once the maximum is reached (or else an empty string).
+// Redundant and unwanted combinations are pruned:
+// - Only the larger value is on the left of + and x;
+// - No multiplying or dividing by 1;
+// - No results which are 0 or negative;
+// - If only integers are allowed, no fractions.
+std::string combine_pairs(
+    PairwiseSearch &search, int pool[], int pool_size, int value_count
+) {
+    if (pool_size == 1) {
+        Rational &value = search.values[pool[0]].value;
+        if (equals_target(value, search.target)) {
+            std::string solution = pairwise_to_string(search, pool[0]);
+            if (!is_new_solution(search.found, solution)) {
+                return "";
             }
+            search.solutions.push_back(solution);
+            return (int) search.solutions.size() >= search.max_solutions ?
+                solution : "";
         }
-        for (std::string operators : operators_product) {
-            if (!check_to_evaluate(operators, current)) {
-                continue;
+        if (is_nearest(*search.nearest, value, search.target)) {
+            set_nearest(
+                *search.nearest, value, search.target,
+                pairwise_to_string(search, pool[0]));
+        }
+        return "";
+    }
+    int next_pool[MAX_SOLUTION_NUMBERS];
+    std::string result;
+    for (int i = 0; i < pool_size; i++) {
+        for (int j = i + 1; j < pool_size; j++) {
+            if (should_stop(*search.control)) {
+                return "";
+            }
+            // Remaining values, with the combined value last.
+            int next_pool_size = 0;
+            for (int k = 0; k < pool_size; k++) {
+                if (k != i && k != j) {
+                    next_pool[next_pool_size++] = pool[k];
+                }
             }
-            for (int i = 0; i < operators.length(); i++) {
-                current[operator_indexes[i]] = operators[i];
+            next_pool[next_pool_size++] = value_count;
+
+            int left = pool[i];
+            int right = pool[j];
+            if (is_less(
+                search.values[left].value, search.values[right].value)
+            ) {
+                std::swap(left, right);
             }
-            result = check_expression_equals_target(current, target);
-            if (result != "") {
-                write_solution(result, filename);
-                return;
+            for (char c : search.operators) {
+                int token = get_operator_token(c);
+                // Both orders only matter for division (larger first).
+                int orders = (
+                    token == DIVIDE && is_less(
+                        search.values[right].value, search.values[left].value)
+                ) ? 2 : 1;
+                for (int order = 0; order < orders; order++) {
+                    if (order) {
+                        std::swap(left, right);
+                    }
+                    Rational combined = combine(
+                        token, search.values[left].value,
+                        search.values[right].value, search.integer_only);
+                    if (!combined.status) {
+                        search.values[value_count] = {
+                            combined, token, left, right};
+                        result = combine_pairs(
+                            search, next_pool, next_pool_size,
+                            value_count + 1);
+                        if (result != "") {
+                            return result;
+                        }
+                    }
+                }
+                if (orders == 2) {
+                    std::swap(left, right);
+                }
+            }
+        }
+    }
+    return "";
+}
+
+
+// Alternative to find_solution: attempts to find up to n solutions
+// using all the given numbers in any order, by combining two values
+// at a time (see combine_pairs), with any parentheses needed.
+// Returns the solutions found, one per line (empty if none),
+// even if the search stopped early (see the control status).
+std::string find_pairwise_solutions(
+    int numbers_array[], int number_count, int target,
+    char operators_c_str[], bool integer_only, int max_solutions,
+    SearchControl &control, Nearest &nearest, SolutionSet *found
+) {
+    if (number_count > MAX_SOLUTION_NUMBERS) {
+        return "";
+    }
+    PairwiseSearch search;
+    search.operators = operators_c_str;
+    search.integer_only = integer_only;
+    search.target = target;
+    search.control = &control;
+    search.nearest = &nearest;
+    search.found = found;
+    search.max_solutions = max_solutions;
+    int pool[MAX_SOLUTION_NUMBERS];
+    for (int i = 0; i < number_count; i++) {
+        search.values[i] = {make_rational(numbers_array[i]), 0, 0, 0};
+        pool[i] = i;
+    }
+    combine_pairs(search, pool, number_count, number_count);
+    std::string result;
+    for (std::string &solution : search.solutions) {
+        result += solution + "\n";
+    }
+    if (result != "") {
+        result.pop_back();
+    }
+    return result;
+}
+
+
+// Writes the result of a search into the buffers provided by the caller
+// (see get_solution_to_buffer), returning the status.
+int write_search_result(
+    std::string &solution, SearchControl &control, Nearest &nearest,
+    char buffer[], int buffer_size,
+    char nearest_buffer[], double *nearest_value
+) {
+    if (nearest_buffer != NULL) {
+        nearest_buffer[0] = 0;
+    }
+    if (control.status) {
+        return control.status;
+    }
+    if (
+        solution == "" && nearest.track && nearest.expression != ""
+        && (int) nearest.expression.length() < buffer_size
+    ) {
+        memcpy(
+            nearest_buffer, nearest.expression.c_str(),
+            nearest.expression.length() + 1);
+        *nearest_value = nearest.value;
+    }
+    if ((int) solution.length() >= buffer_size) {
+        return -1;
+    }
+    memcpy(buffer, solution.c_str(), solution.length() + 1);
+    return solution.length();
+}
+
+
+// Attempts to find a solution (see find_solution),
+// writing it to a file if found.
+void get_solution(
+    int numbers_array[], int number_count, int target,
+    char operators_c_str[], int parentheses_setting, char filename[]
+) {
+    SearchControl control = make_search_control(NULL, 0);
+    Nearest nearest = {false, 0, 0, ""};
+    std::string solution = find_solution(
+        numbers_array, number_count, target,
+        operators_c_str, parentheses_setting, false, control, nearest, NULL);
+    if (solution != "") {
+        write_solution(solution, filename);
+    }
+}
+
+
+// Attempts to find a solution (see find_solution),
+// writing it as a C string into a buffer provided by the caller.
+// The search stops early if the cancel flag is set (if not NULL)
+// or the deadline passes (if not 0).
+// If there is no solution and a nearest buffer is provided (not NULL),
+// the expression nearest to the target, tracked in the same search,
+// is written to it (same size as the buffer) along with its value
+// (empty if there is none, or if stopped early).
+// If a solution set is provided (not NULL), only a solution not
+// equivalent to any in the set is found, and it is added to the set.
+// Returns the solution length, 0 if there is no solution,
+// -1 if the buffer is too small, or the status if stopped early.
+int get_solution_to_buffer(
+    int numbers_array[], int number_count, int target,
+    char operators_c_str[], int parentheses_setting, int integer_only,
+    char buffer[], int buffer_size, int *cancel, long long deadline_ns,
+    char nearest_buffer[], double *nearest_value, void *found
+) {
+    SearchControl control = make_search_control(cancel, deadline_ns);
+    Nearest nearest = {nearest_buffer != NULL, INFINITY, 0, ""};
+    std::string solution = find_solution(
+        numbers_array, number_count, target,
+        operators_c_str, parentheses_setting, integer_only, control, nearest,
+        (SolutionSet*) found);
+    return write_search_result(
+        solution, control, nearest, buffer, buffer_size,
+        nearest_buffer, nearest_value);
+}
+
+
+// Same as get_solution_to_buffer, but up to n solutions are found
+// with the pairwise search (see find_pairwise_solutions), one per line,
+// optionally only allowing integers (no division with a remainder).
+// Solutions found before the search stopped early are still written,
+// as they are already in the solution set, so whether the search
+// stopped early is always reported through the status (0 if not).
+int get_pairwise_solutions_to_buffer(
+    int numbers_array[], int number_count, int target,
+    char operators_c_str[], int integer_only, int max_solutions,
+    char buffer[], int buffer_size, int *cancel, long long deadline_ns,
+    char nearest_buffer[], double *nearest_value, void *found,
+    int *status
+) {
+    SearchControl control = make_search_control(cancel, deadline_ns);
+    Nearest nearest = {nearest_buffer != NULL, INFINITY, 0, ""};
+    std::string solution = find_pairwise_solutions(
+        numbers_array, number_count, target, operators_c_str,
+        integer_only, max_solutions, control, nearest,
+        (SolutionSet*) found);
+    *status = control.status;
+    if (solution != "") {
+        control.status = 0;
+    }
+    return write_search_result(
+        solution, control, nearest, buffer, buffer_size,
+        nearest_buffer, nearest_value);
+}
+
+
+// Same as get_solution_to_buffer, but up to n solutions are sampled
+// uniformly from every solution (see find_sample), one per line.
+int sample_solutions_to_buffer(
+    int numbers_array[], int number_count, int target,
+    char operators_c_str[], int parentheses_setting, int integer_only,
+    int sample_size, char buffer[], int buffer_size,
+    int *cancel, long long deadline_ns,
+    char nearest_buffer[], double *nearest_value, void *found
+) {
+    SearchControl control = make_search_control(cancel, deadline_ns);
+    Nearest nearest = {nearest_buffer != NULL, INFINITY, 0, ""};
+    std::string solutions = find_sample(
+        numbers_array, number_count, target, operators_c_str,
+        parentheses_setting, integer_only, sample_size, control, nearest,
+        (SolutionSet*) found);
+    return write_search_result(
+        solutions, control, nearest, buffer, buffer_size,
+        nearest_buffer, nearest_value);
+}
+
+
+// Searches for every solution in one call (see find_all_solutions),
+// calling back with each as a C string. A non-zero return value from
+// the callback stops the search.
+// The search also stops early if the cancel flag is set (if not NULL)
+// or the deadline passes (if not 0).
+// If a solution set is provided (not NULL), solutions equivalent to any
+// in the set are skipped, or else a solution set for the call is used.
+// Returns the solution count, or the status if stopped early
+// (not by the callback).
+int enumerate_solutions(
+    int numbers_array[], int number_count, int min_count, int max_count,
+    int target, char operators_c_str[], int parentheses_setting,
+    int integer_only, int (*callback)(const char *solution),
+    int *cancel, long long deadline_ns, void *found
+) {
+    SearchControl control = make_search_control(cancel, deadline_ns);
+    SolutionSet solutions;
+    return find_all_solutions(
+        std::vector<int>(numbers_array, numbers_array + number_count),
+        min_count, max_count, target, operators_c_str, parentheses_setting,
+        integer_only, callback, control,
+        found != NULL ? (SolutionSet*) found : &solutions);
+}
+
+
+// Creates an empty solution set (see SolutionSet),
+// which must be freed once no longer needed.
+void *create_solution_set() {
+    return new SolutionSet;
+}
+
+
+void free_solution_set(void *found) {
+    delete (SolutionSet*) found;
+}
+
+
+// Adds a solution found elsewhere to a solution set,
+// so that equivalent solutions are skipped by searches using the set.
+// Returns 1 if added, or 0 if an equivalent solution is already present.
+int add_to_solution_set(void *found, char expression[]) {
+    return add_solution((SolutionSet*) found, expression);
+}
+
+
+// Converts a simple maths expression into tokens (see Expression).
+// Returns false if a number is too big to be a token.
+bool tokenise(char expression[], std::vector<int> &tokens) {
+    for (int i = 0; expression[i]; i++) {
+        if (expression[i] >= '0') {
+            long long number = expression[i] - '0';
+            while (expression[i+1] >= '0') {
+                number = number * 10 + expression[++i] - '0';
+                if (number > INT_MAX) {
+                    return false;
+                }
             }
+            tokens.push_back(number);
+        } else if (expression[i] == '(') {
+            tokens.push_back(OPEN);
+        } else if (expression[i] == ')') {
+            tokens.push_back(CLOSE);
+        } else {
+            tokens.push_back(get_operator_token(expression[i]));
+        }
+    }
+    return true;
+}
+
+
+// Evaluates a simple maths expression with only +/-/*/'/'/() exactly
+// (see evaluate_exact), writing the result as a fraction in lowest terms.
+// Returns 0, or else the status of an invalid result
+// (division by 0, overflow or a malformed expression).
+int eval_exact(
+    char expression[], long long *numerator, long long *denominator
+) {
+    std::vector<int> tokens;
+    if (!tokenise(expression, tokens)) {
+        return RATIONAL_OVERFLOW;
+    }
+    Rational result = evaluate_exact(tokens.data(), tokens.size());
+    *numerator = result.numerator;
+    *denominator = result.denominator;
+    return result.status;
+}
+
+
+// Same as eval_exact, but for many expressions in one call.
+// The expressions are C strings packed into one buffer, each starting
+// at an offset. Results are written into arrays of the same length.
+void eval_exact_many(
+    char expressions[], int offsets[], int count,
+    long long numerators[], long long denominators[], int statuses[]
+) {
+    std::vector<int> tokens;
+    for (int i = 0; i < count; i++) {
+        tokens.clear();
+        if (!tokenise(expressions + offsets[i], tokens)) {
+            statuses[i] = RATIONAL_OVERFLOW;
+            continue;
         }
+        Rational result = evaluate_exact(tokens.data(), tokens.size());
+        numerators[i] = result.numerator;
+        denominators[i] = result.denominator;
+        statuses[i] = result.status;
     }
 }
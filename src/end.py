@@ -14,8 +14,10 @@ from mechanics.achievements import (
     format_tiered_achievement, format_special_achievement,
     get_achievement_count, TIERED_ACHIEVEMENTS, complete_special_achievement)
 from mechanics.options import get_option
+from mechanics.targets import estimate_difficulty
 from utils.colours import *
-from utils.utils import get_sfx, ink_free, days_to_seconds
+from utils.utils import (
+    get_sfx, ink_free, days_to_seconds, analyse_solution, SolutionAnalysis)
 
 
 OPERATORS = "+-x÷"
@@ -65,6 +67,9 @@ ADD_XP_DELAY_MS = 40
 
 SHOW_ACHIEVEMENT_DELAY_MS = 500
 
+# How often to check if the round hints are found yet.
+HINTS_POLL_MS = 100
+
 # Achievements based on statistics
 # that can only increase by 1 per round, if at all.
 INCREMENTING_ACHIEVEMENTS_KEYS = ("games_played", "wins", "best_streak")
@@ -90,40 +95,51 @@ def get_losing_message() -> str:
     return secrets.choice(LOSING_MESSAGES)
 
 
-def get_xp_earned(solution: str | None) -> tuple[int, list[str]]:
+def get_hints_message(hints: "solutions.RoundHints | None") -> str:
+    """
+    Describes how the round could have been solved, from the hints
+    found in the background during the round.
+    """
+    if hints is None:
+        return ""
+    if not hints.finished.is_set():
+        return "Checking if this was solvable..."
+    if hints.solvable:
+        return (
+            f"Solvable with {hints.min_number_count} numbers: "
+            f"{hints.example} = {hints.target}")
+    if hints.solvable is False:
+        return "No solution could be found!"
+    return "Not sure if this was solvable."
+
+
+def get_xp_earned(
+    analysis: SolutionAnalysis | None) -> tuple[int, list[str]]:
     """
-    Gets the XP earned along with the sources of XP.
+    Gets the XP earned along with the sources of XP,
+    given the analysis of the solution (None if no solution).
     """
     streak = stats.get_win_streak()
     xp_earned = XP_FOR_PLAYING
     xp_sources = [f"Completed a round (+{XP_FOR_PLAYING}XP)"]
-    if solution is not None:
+    if analysis is not None:
         xp_earned += SOLUTION_XP
         xp_sources.append(f"Solution (+{SOLUTION_XP}XP)")
         # Add operator XP
         for operator, xp in XP_PER_OPERATOR.items():
-            count = solution.count(operator)
+            count = analysis.operator_counts[operator]
             if count:
                 earned = count * xp
                 xp_earned += earned
                 xp_sources.append(
                     f"{operator} operator x{count} (+{earned}XP)")
 
-        if all(operator in solution for operator in OPERATORS):
+        if all(analysis.operator_counts.values()):
             # Bonus for using all operators.
             xp_earned += ALL_OPERATORS_XP
             xp_sources.append(f"All operators used (+{ALL_OPERATORS_XP}XP)")
 
-        numbers_used = 0
-        currently_in_number = False
-        for char in solution:
-            if char.isdigit():
-                if not currently_in_number:
-                    numbers_used += 1
-                    currently_in_number = True
-            else:
-                currently_in_number = False
-
+        numbers_used = len(analysis.numbers)
         numbers_used_multiplier = NUMBERS_USED_XP_MULTIPLIER.get(numbers_used)
         if numbers_used_multiplier is not None:
             # Multiply XP by a factor if 5 or more numbers used.
@@ -251,29 +267,26 @@ class GameData:
         self.start_time = start_time
         self.stop_time = stop_time
         self.is_win = self.solution is not None
+        # Index of the difficulty level (so wins can be broken down by it),
+        # then the solution count and fewest numbers needed (see Difficulty).
+        difficulty = estimate_difficulty(tuple(sorted(numbers)), target)
+        self.difficulty = [
+            difficulty.level, difficulty.solution_count,
+            difficulty.min_number_count]
         self.big_numbers = 0
         self.small_numbers = 0
 
-        if self.is_win:
-            self.operator_counts = {
-                operator: self.solution.count(operator)
-                for operator in OPERATORS
-            }
-            number = ""
-            # Space purposely added for final check for a number.
-            for char in self.solution + " ":
-                if char.isdigit():
-                    number += char
-                elif number:
-                    if len(number) == 1:
-                        self.small_numbers += 1
-                    else:
-                        self.big_numbers += 1
-                    number = ""
+        # One pass over the solution for all of its stats.
+        analysis = (
+            analyse_solution(self.solution) if self.is_win else None)
+        if analysis is not None:
+            self.operator_counts = analysis.operator_counts
+            self.small_numbers = analysis.small_numbers
+            self.big_numbers = analysis.big_numbers
         else:
             self.operator_counts = dict.fromkeys(OPERATORS, 0)
 
-        self.xp_earned, self.xp_sources = get_xp_earned(self.solution)
+        self.xp_earned, self.xp_sources = get_xp_earned(analysis)
 
     def save(self) -> None:
         """
@@ -289,17 +302,20 @@ class GameEnd(tk.Frame):
     - Indicating a win or loss.
     - Displaying XP earned. If level up, display it.
     - Displaying any achievements earned that round.
+    - Displaying how the round could have been solved.
     - Allowing the player to generate possible solutions.
     """
 
     def __init__(
         self, root: tk.Tk, solution: str | None, numbers: list[int],
         target: int, start_time: float, stop_time: float,
-        starting_achievement_count: int
+        starting_achievement_count: int,
+        hints: "solutions.RoundHints | None" = None
     ) -> None:
         super().__init__(root)
         self.root = root
         self.root.title("Countdown - Finish")
+        self.hints = hints
 
         self.title_label = tk.Label(
             self, font=ink_free(75, True), text="Finish")
@@ -311,6 +327,8 @@ class GameEnd(tk.Frame):
             if is_win else get_losing_message())
         self.message_label = tk.Label(
             self, font=ink_free(25, italic=True), text=message, width=60)
+        self.hints_label = tk.Label(self, font=ink_free(20))
+        self.show_hints()
 
         self.options_frame = GameEndOptionsFrame(self, is_win)
         self.solutions_frame = solutions.SolutionsFrame(
@@ -367,18 +385,31 @@ class GameEnd(tk.Frame):
                 row=0, column=0, columnspan=2, padx=15, pady=5)
             self.message_label.grid(
                 row=1, column=0, columnspan=2, padx=10, pady=5)
+            self.hints_label.grid(row=2, column=0, columnspan=2, padx=10)
             self.streak_label.grid(
-                row=2, column=0, columnspan=2, padx=10, pady=5)
-            self.xp_frame.grid(row=3, column=0, padx=10, pady=5, sticky="n")
+                row=3, column=0, columnspan=2, padx=10, pady=5)
+            self.xp_frame.grid(row=4, column=0, padx=10, pady=5, sticky="n")
             self.achievements_frame.grid(
-                row=3, column=1, padx=10, pady=5, sticky="n")
+                row=4, column=1, padx=10, pady=5, sticky="n")
             self.options_frame.grid(
-                row=4, column=0, columnspan=2, padx=10, pady=5)
+                row=5, column=0, columnspan=2, padx=10, pady=5)
         else:
             self.title_label.pack(padx=25, pady=25)
             self.message_label.pack(padx=25, pady=25)
+            self.hints_label.pack(padx=25)
             self.options_frame.pack(padx=25, pady=25)
 
+    def show_hints(self) -> None:
+        """
+        Displays how the round could have been solved,
+        waiting for the hints if still being found.
+        """
+        if not self.winfo_exists():
+            return
+        self.hints_label.config(text=get_hints_message(self.hints))
+        if self.hints is not None and not self.hints.finished.is_set():
+            self.after(HINTS_POLL_MS, self.show_hints)
+
     def exit(self) -> None:
         """
         Exits the game over screen.
@@ -410,6 +441,9 @@ class GameEnd(tk.Frame):
         """
         Allows the player to generate solutions.
         """
+        if self.hints is not None and self.hints.finished.is_set():
+            # Solutions found during the round are ready straight away.
+            self.solutions_frame.show_hints(self.hints)
         self.pack_forget()
         self.solutions_frame.pack()
         self.root.title("Countdown - Finish - Solutions")
@@ -1,13 +1,16 @@
 """
 Module of the main game itself.
 """
+import concurrent.futures
 import ctypes
 import itertools
 import json
 import math
 import secrets
+import threading
 import time
 import tkinter as tk
+from concurrent.futures import Future
 from timeit import default_timer as timer
 from tkinter import messagebox
 
@@ -16,12 +19,14 @@ import menu
 from utils.colours import *
 from utils.io import check_folder_exists, FOLDER
 from utils.utils import (
-    draw_circle, evaluate, bool_to_state, get_sfx, get_music, ink_free,
-    seconds_to_hhmmss, load_cpp_library, machine_expression)
+    draw_circle, bool_to_state, get_sfx, get_music, ink_free,
+    seconds_to_hhmmss, load_cpp_library, SolutionEvaluator)
 from mechanics.achievements import (
     format_special_achievement, get_achievement_count,
     complete_special_achievement)
+from mechanics import solutions
 from mechanics.options import get_option, get_options
+from mechanics.targets import get_random_target
 
 
 NUMBER_COUNT = 7
@@ -44,9 +49,17 @@ SHUFFLE_DELAY_MS = 50
 
 COUNTDOWN_REFRESH_RATE_MS = 25
 
+# Target generation runs in the background during the pre-countdown.
+# If still not done by GO, wait at most this long (once) before showing
+# progress, and then check without blocking at this rate.
+TARGET_WAIT_S = 0.05
+TARGET_POLL_MS = 25
+
 DURATION_S = 30
 
 MAX_SOLUTION_LENGTH = 64
+# Non-integer values of the solution so far are shown rounded.
+LIVE_VALUE_DECIMAL_PLACES = 3
 
 # For keybinds whilst entering the solution.
 KEY_TO_ACTUAL = {
@@ -66,18 +79,45 @@ _generate_number = load_cpp_library("generate.so").generate_number
 _generate_number.restype = ctypes.c_int
 
 
-def generate_number(numbers: list[int]) -> int:
+def generate_number(numbers: list[int], integer_only: bool = False) -> int:
     """
     Gets a random target number from 201 to 999.
+    Looked up in the precomputed target table if possible,
+    or else generated in C++.
+    If only integers are allowed, the target number must be possible
+    without fractions or negatives at any point.
     """
     recent = get_recent_numbers()
-    result = _generate_number(
-        (ctypes.c_int * NUMBER_COUNT)(*numbers),
-        (ctypes.c_int * len(recent))(*recent), len(recent))
+    result = get_random_target(numbers, integer_only, recent)
+    if result is None:
+        # Not cancellable and no deadline.
+        result = _generate_number(
+            (ctypes.c_int * NUMBER_COUNT)(*numbers),
+            (ctypes.c_int * len(recent))(*recent), len(recent),
+            None, ctypes.c_longlong(0), integer_only)
     add_recent_number(result)
     return result
 
 
+def generate_number_in_background(
+    numbers: list[int], integer_only: bool = False) -> Future:
+    """
+    Starts generating a target number in a background thread,
+    so the GUI is never blocked by it.
+    Returns a future which holds the target number once generated.
+    """
+    future = Future()
+
+    def generate() -> None:
+        try:
+            future.set_result(generate_number(numbers, integer_only))
+        except Exception as e:
+            future.set_exception(e)
+
+    threading.Thread(target=generate, daemon=True).start()
+    return future
+
+
 @check_folder_exists()
 def get_recent_numbers() -> list[int]:
     """
@@ -132,6 +172,8 @@ class Game(tk.Frame):
             sfx.set_volume(options["sfx"])
         self.music = get_music(options["music"]["countdown"])
         self.music.set_volume(options["music"]["on"])
+        # Found in the background once the target is known.
+        self.hints = None
 
         self.frame = SelectNumbersFrame(self)
         self.frame.pack()
@@ -140,6 +182,8 @@ class Game(tk.Frame):
         """
         Return back to the main menu.
         """
+        if self.hints is not None:
+            self.hints.cancel()
         self.destroy()
         menu.MainMenu(self.root).pack()
 
@@ -152,10 +196,20 @@ class Game(tk.Frame):
             int(label.cget("text"))
             for label in self.frame.selected_numbers_frame.number_labels]
         self.start_time = time.time()
+        # Numbers locked in - generate the target during the pre-countdown.
+        target_future = generate_number_in_background(numbers)
         self.frame.destroy()
-        self.frame = CountdownFrame(self, numbers)
+        self.frame = CountdownFrame(self, numbers, target_future)
         self.frame.pack()
 
+    def find_hints(self, numbers: list[int], target: int) -> None:
+        """
+        Starts finding hints for the round while it is played,
+        ready for the end of the round.
+        """
+        self.hints = solutions.RoundHints(numbers, target)
+        self.hints.find_in_background()
+
     def end(self) -> None:
         """
         Ends the round, leading the player to enter a solution.
@@ -177,7 +231,7 @@ class Game(tk.Frame):
         stop_time = time.time()
         end.GameEnd(
             self.root, solution, numbers, target, self.start_time, stop_time,
-            self.starting_achievement_count).pack()
+            self.starting_achievement_count, self.hints).pack()
 
 
 class SelectNumbersFrame(tk.Frame):
@@ -388,10 +442,13 @@ class CountdownFrame(tk.Frame):
     the player is automatically redirected to enter their solution.
     """
 
-    def __init__(self, master: Game, numbers: list[int]) -> None:
+    def __init__(
+        self, master: Game, numbers: list[int], target_future: Future
+    ) -> None:
         super().__init__(master)
         self.master = master
         self.numbers = numbers
+        self.target_future = target_future
         # Start with the countdown.
         # See self.start for the widgets of the actual round in action.
         self.pre_countdown(3, True)
@@ -418,13 +475,24 @@ class CountdownFrame(tk.Frame):
         self.pre_countdown_label.config(text=seconds)
         self.after(1000, lambda: self.pre_countdown(seconds - 1))
 
-    def start(self) -> None:
+    def start(self, first: bool = True) -> None:
         """
-        Begins the countdown round.
+        Begins the countdown round, once the target is generated.
         """
+        if first:
+            try:
+                self.target_future.result(TARGET_WAIT_S)
+            except concurrent.futures.TimeoutError:
+                pass
+        if not self.target_future.done():
+            # Target still being generated, show progress and check again.
+            self.pre_countdown_label.config(text="...")
+            self.after(TARGET_POLL_MS, lambda: self.start(False))
+            return
+        self.target = self.target_future.result()
+        self.master.find_hints(self.numbers, self.target)
         self.pre_countdown_label.destroy()
         GO_SFX.stop()
-        self.target = generate_number(self.numbers)
 
         self.target_number_label = TargetNumberLabel(self, self.target, True)
         self.selected_numbers_frame = SelectedNumbersFrame(self, self.numbers)
@@ -646,18 +714,22 @@ class EnterSolutionFrame(tk.Frame):
                 self, font=ink_free(25), width=25,
                 text=f"Time left: {seconds_to_hhmmss(self.max_seconds)}")
         self.solution_label = SolutionLabel(self)
+        self.live_value_label = tk.Label(self, font=ink_free(20), text="")
         self.solution_buttons = SolutionButtonsFrame(self)
         self.option_buttons = EnterSolutionOptionsFrame(self)
 
         self.used_numbers = []
         self.opening_parentheses = 0
         self.closing_parentheses = 0
+        # Updated as each input is added or removed.
+        self.evaluator = SolutionEvaluator()
 
         self.title_label.pack(padx=25, pady=15)
         if option["on"]:
             self.time_left_label.pack(padx=10, pady=10)
             self.update_time_remaining()
         self.solution_label.pack(padx=10, pady=10)
+        self.live_value_label.pack(padx=10)
         self.solution_buttons.pack(padx=10, pady=10)
         self.option_buttons.pack(padx=10, pady=(50, 10))
 
@@ -680,6 +752,7 @@ class EnterSolutionFrame(tk.Frame):
                 # Cannot insert two more characters 'x('
                 return
             new_solution = f"{current_solution}x{to_add}"
+            self.evaluator.push("x")
         else:
             if len(current_solution) > MAX_SOLUTION_LENGTH - len(to_add):
                 # Cannot insert n more characters.
@@ -687,6 +760,9 @@ class EnterSolutionFrame(tk.Frame):
             new_solution = current_solution + to_add
 
         self.solution_label.config(text=new_solution)
+        if not from_pop:
+            self.evaluator.push(to_add)
+        self.update_live_value(to_add.isdigit() or to_add == ")")
 
         if to_add.isdigit() or to_add == ")":
             # Next, an operator or closing parenthesis is expected.
@@ -765,6 +841,7 @@ class EnterSolutionFrame(tk.Frame):
             index = min(index + 1, -1)
 
         to_remove = current_solution[index:]
+        self.evaluator.pop()
         if to_remove.isdigit():
             # Removes number from used numbers as needed.
             self.used_numbers.remove(to_remove)
@@ -803,8 +880,10 @@ class EnterSolutionFrame(tk.Frame):
         self.used_numbers = []
         self.opening_parentheses = 0
         self.closing_parentheses = 0
+        self.evaluator.reset()
 
         self.solution_label.config(text="")
+        self.live_value_label.config(text="")
         for button in self.solution_buttons:
             button.config(
                 state=bool_to_state(
@@ -841,10 +920,10 @@ class EnterSolutionFrame(tk.Frame):
         the solution is incorrect/invalid.
         """
         solution = self.solution_label.get()
-        to_evaluate = machine_expression(solution)
         INCORRECT_SOLUTION_SFX.stop()
 
-        if evaluate(to_evaluate) == self.target:
+        # Already evaluated exactly as the solution was entered.
+        if self.evaluator.get_value() == self.target:
             CORRECT_SOLUTION_SFX.play()
             self.master.proceed_to_finish(solution, self.numbers, self.target)
         else:
@@ -864,6 +943,23 @@ class EnterSolutionFrame(tk.Frame):
         """
         self.master.proceed_to_finish(None, self.numbers, self.target)
 
+    def update_live_value(self, is_complete: bool) -> None:
+        """
+        Shows the value of the solution so far, unless it ends with
+        an operator or opening parenthesis (nothing shown).
+        """
+        if not is_complete:
+            self.live_value_label.config(text="")
+            return
+        value = self.evaluator.get_value()
+        if value is None:
+            text = "Division by 0"
+        elif isinstance(value, int):
+            text = f"= {value}"
+        else:
+            text = f"≈ {round(float(value), LIVE_VALUE_DECIMAL_PLACES)}"
+        self.live_value_label.config(text=text)
+
     def update_time_remaining(self) -> None:
         """
         Updates the time remaining. If time is up, the solution
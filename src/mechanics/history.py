@@ -22,6 +22,7 @@ from utils.colours import *
 from utils.io import check_folder_exists, FOLDER
 from utils.utils import epoch_to_strftime, ink_free, days_to_seconds
 from . import solutions
+from .targets import DIFFICULTY_LEVELS
 
 
 MAX_SOLUTION_DISPLAY_LENGTH = 36
@@ -304,6 +305,7 @@ class GameDataStatsFrame(tk.Frame):
     - Start time
     - Stop time
     - Outcome
+    - Difficulty
     - Solution
     - XP earned
     - XP sources
@@ -314,6 +316,10 @@ class GameDataStatsFrame(tk.Frame):
         start_time = epoch_to_strftime(master.data["start_time"])
         stop_time = epoch_to_strftime(master.data["stop_time"])
         outcome = "Win!" if master.data["is_win"] else "Loss"
+        # Not recorded for older games.
+        difficulty = (
+            DIFFICULTY_LEVELS[master.data["difficulty"][0]]
+            if "difficulty" in master.data else "Unknown")
         solution = master.data["solution"] or "N/A"
         if len(solution) > MAX_SOLUTION_DISPLAY_LENGTH:
             solution = "Too long to display!"
@@ -325,7 +331,8 @@ class GameDataStatsFrame(tk.Frame):
             text="\n".join(
                 (
                     f"Start time: {start_time}", f"Finish time: {stop_time}",
-                    f"Outcome: {outcome}", f"Solution: {solution}",
+                    f"Outcome: {outcome}", f"Difficulty: {difficulty}",
+                    f"Solution: {solution}",
                     f"{xp_earned}XP earned")))
         self.xp_sources_frame = XpSourcesFrame(self, xp_sources)
 
@@ -3,22 +3,25 @@ Handles generation of solutions with the usable numbers
 along with a target number, with certain settings allowed.
 """
 import ctypes
-import itertools
+import functools
+import gzip
+import json
 import os
+import queue
 import secrets
-import string
 import threading
 import tkinter as tk
-from contextlib import suppress
 from timeit import default_timer as timer
-from typing import Literal
+from typing import Callable, Literal
 
 import game
 from utils.colours import *
-from utils.io import TEMPORARY_FOLDER, create_temp_folder
+from utils.io import check_folder_exists, FOLDER
 from utils.utils import (
-    get_sfx, ink_free, load_cpp_library, human_expression, machine_expression)
+    get_sfx, ink_free, load_cpp_library, human_expression, machine_expression,
+    analyse_solution)
 from .options import get_option
+from .targets import ReachabilityMap
 
 
 OPERATORS = "+-x÷"
@@ -40,25 +43,99 @@ DEFAULT_SOLUTIONS_SECONDS = 10
 SOLUTION_FOUND_SFX = get_sfx("solutionfound.wav")
 NO_SOLUTION_FOUND_SFX = get_sfx("nosolutionfound.wav")
 
-POSSIBLE_SOLUTION_FILENAME_CHARACTERS = string.digits + string.ascii_lowercase
-SOLUTION_FILENAME_LENGTH = 12
+# Plenty of space for any solution with up to 7 numbers.
+SOLUTION_BUFFER_SIZE = 256
 
+# The C++ search releases the GIL, so threads search truly in parallel.
+PARALLEL_THREAD_COUNT = os.cpu_count() or 1
 
-get_solution = load_cpp_library("generate.so").get_solution
-get_solution.restype = ctypes.c_double
+# How often solutions found so far are moved into the listbox.
+SOLUTIONS_REFRESH_RATE_MS = 50
+# Queued once solution generation is complete.
+GENERATION_FINISHED = None
+
+# Solutions already generated, by round and settings.
+SOLUTION_CACHE_FILE = f"{FOLDER}/solution_cache"
+# Least recently used entries are removed until the cache (as JSON,
+# before compression) is no bigger than this.
+MAX_SOLUTION_CACHE_BYTES = 2_000_000
+solution_cache_lock = threading.Lock()
+# Keys read since the cache was last saved, in order of use, so reading
+# never rewrites the cache. Only recorded once the cache is next saved.
+recently_read_keys = {}
+
+# Solvers: permutations of numbers with every operator and parentheses
+# combination (templates), or combining two values at a time (pairwise).
+TEMPLATE_SOLVER = "templates"
+PAIRWISE_SOLVER = "pairwise"
+
+# Hints are found with the default solutions screen settings (so they can
+# be cached for it) on one thread, within this time limit.
+HINTS_SECONDS_LIMIT = 5
+
+# Returned by C++ if the search stopped early.
+SEARCH_CANCELLED = -2
+SEARCH_TIMED_OUT = -3
+
+
+get_solution = load_cpp_library("generate.so").get_solution_to_buffer
+get_solution.restype = ctypes.c_int
+
+# Uniformly samples solutions of a permutation (one per line).
+sample_solutions = (
+    load_cpp_library("generate.so").sample_solutions_to_buffer)
+sample_solutions.restype = ctypes.c_int
+
+get_pairwise_solutions = (
+    load_cpp_library("generate.so").get_pairwise_solutions_to_buffer)
+get_pairwise_solutions.restype = ctypes.c_int
+
+# Every solution in one call, each passed to a callback as found.
+enumerate_solutions = load_cpp_library("generate.so").enumerate_solutions
+enumerate_solutions.restype = ctypes.c_int
+# Returns non-zero to stop the search.
+SOLUTION_CALLBACK = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_char_p)
+
+monotonic_ns = load_cpp_library("generate.so").monotonic_ns
+monotonic_ns.restype = ctypes.c_longlong
+
+# Canonical forms of solutions found, to skip equivalent solutions.
+create_solution_set = load_cpp_library("generate.so").create_solution_set
+create_solution_set.restype = ctypes.c_void_p
+free_solution_set = load_cpp_library("generate.so").free_solution_set
+free_solution_set.argtypes = (ctypes.c_void_p,)
+add_to_solution_set = load_cpp_library("generate.so").add_to_solution_set
+add_to_solution_set.argtypes = (ctypes.c_void_p, ctypes.c_char_p)
+add_to_solution_set.restype = ctypes.c_int
 
 
 class SolutionGenerationSettings:
     """
     Holds the settings of what types of solutions are generated
     and the time limit for generation.
+    The pairwise solver always allows nested parentheses, and never
+    allows intermediate results which are 0 or negative.
+    If only integers are allowed, as in the real game, every
+    intermediate result must be a positive integer.
+    If uniform, the template solver samples each permutation's solution
+    uniformly instead of taking the first one found, which is slower
+    but not biased towards particular parentheses and operators.
     """
 
     def __init__(
         self, min_number_count: int, max_number_count: int,
         max_solution_count: int, nested_parentheses: bool | None,
-        operators: str, seconds_limit: int
+        operators: str, seconds_limit: int, parallel: bool = True,
+        find_nearest: bool = False,
+        solver: Literal["templates", "pairwise"] = TEMPLATE_SOLVER,
+        integer_only: bool = False, uniform: bool = False
     ) -> None:
+        if solver == PAIRWISE_SOLVER and nested_parentheses is not True:
+            raise ValueError(
+                "The pairwise solver requires nested parentheses.")
+        if solver == PAIRWISE_SOLVER and uniform:
+            raise ValueError(
+                "Only the template solver can sample uniformly.")
         self.min_number_count = min_number_count
         self.max_number_count = max_number_count
         self.max_solution_count = max_solution_count
@@ -66,57 +143,526 @@ class SolutionGenerationSettings:
             nested_parentheses if nested_parentheses is not None else -1)
         self.operators = operators
         self.seconds_limit = seconds_limit
+        # Search permutations across all CPU cores or just one.
+        self.thread_count = PARALLEL_THREAD_COUNT if parallel else 1
         # In case generation is aborted.
-        self.cancel = False
+        # Shared with C++ so that even a search in progress stops.
+        self.cancel = ctypes.c_int(False)
+        # Once generation is complete: if every permutation was searched.
+        self.exhaustive = False
+        # If no solutions are found, also find the closest expression
+        # to the target in the same search: (expression, value) or None.
+        self.find_nearest = find_nearest
+        self.nearest = None
+        self.solver = solver
+        self.integer_only = integer_only
+        self.uniform = uniform
+
+    def get_cache_key(self, numbers: list[int], target: int) -> str:
+        """
+        Gets the key of the solutions to a round with these settings
+        in the solution cache. Settings only limiting the time spent
+        or the number of solutions do not affect the key.
+        """
+        return "|".join((
+            ",".join(map(str, sorted(numbers))), str(target),
+            "".join(sorted(self.operators)), str(self.parentheses_option),
+            f"{self.min_number_count}-{self.max_number_count}",
+            self.solver, "integer" if self.integer_only else "any",
+            "uniform" if self.uniform else "first"))
+
+
+@functools.cache
+def count_permutations(multiplicities: tuple[int], count: int) -> int:
+    """
+    Counts the distinct permutations of n numbers from a multiset,
+    given how many copies there are of each distinct number.
+    """
+    if not count:
+        return 1
+    total = 0
+    for i, multiplicity in enumerate(multiplicities):
+        if multiplicity:
+            total += count_permutations(
+                multiplicities[:i] + (multiplicity - 1,)
+                + multiplicities[i + 1:], count - 1)
+    return total
+
+
+@functools.cache
+def count_combinations(multiplicities: tuple[int], count: int) -> int:
+    """
+    Counts the distinct combinations of n numbers from a multiset,
+    given how many copies there are of each distinct number.
+    """
+    if not multiplicities:
+        return int(not count)
+    return sum(
+        count_combinations(multiplicities[1:], count - copies)
+        for copies in range(min(multiplicities[0], count) + 1))
+
+
+class PermutationSampler:
+    """
+    Iterates over all distinct permutations of n numbers (for each count
+    of numbers allowed) in random order, without storing them all.
+    Repeated numbers are interchangeable, so orders only differing by
+    which copy of a number is where are only taken once.
+    Each permutation is identified by an index, and the indexes of each
+    count are shuffled lazily (Fisher-Yates, storing only swaps).
+    The count of the next permutation is chosen with uniform probability
+    from the counts which still have permutations left.
+    If not ordered, combinations are iterated over instead.
+    """
+
+    def __init__(
+        self, numbers: list[int], min_count: int, max_count: int,
+        ordered: bool = True
+    ) -> None:
+        self.values = sorted(set(numbers))
+        self.multiplicities = tuple(
+            numbers.count(value) for value in self.values)
+        self.ordered = ordered
+        self.remaining = {
+            count: (count_permutations if ordered else count_combinations)(
+                self.multiplicities, count)
+            for count in range(min_count, max_count + 1)}
+        self.swaps = {count: {} for count in self.remaining}
+
+    def __iter__(self) -> "PermutationSampler":
+        return self
+
+    def __next__(self) -> tuple[int]:
+        counts = [
+            count for count, remaining in self.remaining.items()
+            if remaining]
+        if not counts:
+            raise StopIteration
+        count = secrets.choice(counts)
+        swaps = self.swaps[count]
+        last = self.remaining[count] - 1
+        i = secrets.randbelow(last + 1)
+        # Index at i is taken, replaced by the index at the end.
+        index = swaps.get(i, i)
+        swaps[i] = swaps.get(last, last)
+        swaps.pop(last, None)
+        self.remaining[count] = last
+        if not self.ordered:
+            return self.get_combination(index, count)
+        return self.get_permutation(index, count)
+
+    def get_permutation(self, index: int, count: int) -> tuple[int]:
+        """
+        Gets the distinct permutation of a given count with a given index
+        (in lexicographic order).
+        """
+        multiplicities = list(self.multiplicities)
+        permutation = []
+        for i in range(count):
+            for position, value in enumerate(self.values):
+                if not multiplicities[position]:
+                    continue
+                # Skip the permutations continuing with smaller numbers.
+                multiplicities[position] -= 1
+                skipped = count_permutations(
+                    tuple(multiplicities), count - i - 1)
+                if index < skipped:
+                    permutation.append(value)
+                    break
+                index -= skipped
+                multiplicities[position] += 1
+        return tuple(permutation)
+
+    def get_combination(self, index: int, count: int) -> tuple[int]:
+        """
+        Gets the distinct combination of a given count with a given index
+        (in lexicographic order).
+        """
+        combination = []
+        for position, value in enumerate(self.values):
+            rest = self.multiplicities[position + 1:]
+            # Most copies of each number first, skipping combinations.
+            for copies in range(
+                min(self.multiplicities[position], count), -1, -1
+            ):
+                skipped = count_combinations(rest, count - copies)
+                if index < skipped:
+                    combination.extend([value] * copies)
+                    count -= copies
+                    break
+                index -= skipped
+        return tuple(combination)
 
 
 def generate_solutions(
-    numbers: list[int], target: int,
-    settings: SolutionGenerationSettings) -> list[str]:
+    numbers: list[int], target: int, settings: SolutionGenerationSettings,
+    callback: Callable[[str], None] | None = None,
+    excluded: set[str] | None = None) -> list[str]:
     """
     Gets solutions for a given target number with particular smaller
     numbers based on certain settings.
+    If a callback is provided, it is called with each solution
+    as soon as it is found (from a search thread).
+    Solutions which are excluded (e.g. already known) are skipped,
+    as are solutions equivalent to any other solution (only differing
+    by the order of operands of + and x or how they are grouped).
+    The pairwise solver does not depend on the order of the numbers,
+    so it searches combinations instead, each until no new solution.
     """
     if not settings.operators:
+        settings.exhaustive = True
         return []
     start = timer()
     solutions = []
-    # Uniform probability for n numbers to be tried.
-    perms = [
-        list(itertools.permutations(numbers, count))
-        for count in range(
-            settings.min_number_count, settings.max_number_count + 1)]
+    # Shared by all search threads, so each solution found is unique.
+    found = ctypes.c_void_p(create_solution_set())
+    for solution in excluded or ():
+        add_to_solution_set(found, machine_expression(solution).encode())
+    # Whether all permutations were taken, and if any search was cut short.
+    exhausted = stopped_early = False
+    pairwise = settings.solver == PAIRWISE_SOLVER
+    perms = PermutationSampler(
+        numbers, settings.min_number_count, settings.max_number_count,
+        ordered=not pairwise)
     operators = ctypes.c_char_p(settings.operators.encode())
+    # Shared by all search threads, for the permutations and solutions.
+    lock = threading.Lock()
+    # Deadline in C++ monotonic time, so a search can stop mid-permutation.
+    deadline_ns = ctypes.c_longlong(
+        monotonic_ns() + int(settings.seconds_limit * 1e9)
+        if settings.seconds_limit != float("inf") else 0)
+
+    def search() -> None:
+        nonlocal exhausted, stopped_early
+        # Reused for every solution found - no allocation needed per attempt.
+        # Pairwise searches find every solution still wanted in one call.
+        buffer_size = SOLUTION_BUFFER_SIZE * (
+            settings.max_solution_count if pairwise else 1)
+        buffer = ctypes.create_string_buffer(buffer_size)
+        if settings.find_nearest:
+            nearest_buffer = ctypes.create_string_buffer(buffer_size)
+        else:
+            nearest_buffer = None
+        nearest_value = ctypes.c_double()
+        while not settings.cancel.value:
+            with lock:
+                if (
+                    timer() - start >= settings.seconds_limit
+                    or len(solutions) >= settings.max_solution_count
+                ):
+                    stopped_early = True
+                    return
+                choice = next(perms, None)
+                remaining = settings.max_solution_count - len(solutions)
+            if choice is None:
+                exhausted = True
+                return
+            if pairwise:
+                status = ctypes.c_int()
+                length = get_pairwise_solutions(
+                    (ctypes.c_int * len(choice))(*choice), len(choice),
+                    target, operators, settings.integer_only, remaining,
+                    buffer, buffer_size,
+                    ctypes.byref(settings.cancel), deadline_ns,
+                    nearest_buffer, ctypes.byref(nearest_value), found,
+                    ctypes.byref(status))
+                if status.value:
+                    # Any solutions found before stopping are still kept.
+                    stopped_early = True
+            elif settings.uniform:
+                # One solution per permutation, for variety.
+                length = sample_solutions(
+                    (ctypes.c_int * len(choice))(*choice), len(choice),
+                    target, operators, settings.parentheses_option,
+                    settings.integer_only, 1, buffer, buffer_size,
+                    ctypes.byref(settings.cancel), deadline_ns,
+                    nearest_buffer, ctypes.byref(nearest_value), found)
+            else:
+                length = get_solution(
+                    (ctypes.c_int * len(choice))(*choice), len(choice),
+                    target, operators, settings.parentheses_option,
+                    settings.integer_only, buffer, buffer_size,
+                    ctypes.byref(settings.cancel), deadline_ns,
+                    nearest_buffer, ctypes.byref(nearest_value), found)
+            if length in (SEARCH_CANCELLED, SEARCH_TIMED_OUT):
+                stopped_early = True
+            elif not length and nearest_buffer is not None:
+                if nearest_buffer.value:
+                    nearest = (
+                        human_expression(nearest_buffer.value.decode()),
+                        int(nearest_value.value))
+                    with lock:
+                        if settings.nearest is None or abs(
+                            nearest[1] - target
+                        ) < abs(settings.nearest[1] - target):
+                            settings.nearest = nearest
+            elif length > 0:
+                new_solutions = buffer.value.decode().split("\n")
+                with lock:
+                    for solution in map(human_expression, new_solutions):
+                        if len(solutions) < settings.max_solution_count:
+                            solutions.append(solution)
+                            if callback is not None:
+                                callback(solution)
+
+    try:
+        if settings.thread_count == 1:
+            search()
+        else:
+            threads = [
+                threading.Thread(target=search, daemon=True)
+                for _ in range(settings.thread_count)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+    finally:
+        free_solution_set(found)
+
+    settings.exhaustive = (
+        exhausted and not stopped_early and not settings.cancel.value)
+    if solutions:
+        # Only relevant if nothing reaches the target.
+        settings.nearest = None
+    return solutions if not settings.cancel.value else []
+
+
+def stream_solutions(
+    numbers: list[int], target: int, settings: SolutionGenerationSettings,
+    callback: Callable[[str], None] | None = None,
+    excluded: set[str] | None = None) -> list[str]:
+    """
+    Same as generate_solutions, but the whole search is a single call
+    to C++, which walks every distinct permutation of the numbers in
+    order and streams each solution back as soon as it is found.
+    Always uses the template solver on one thread, and never finds
+    the nearest expression.
+    Not used by the game itself: even searching every permutation of
+    an unsolvable round, it is no faster than generate_solutions on one
+    thread (which also spreads across every CPU core), and it finds
+    the first solutions much later, since permutations are in order
+    rather than random. Nor can it sample uniformly, as the solutions
+    screen and round hints do.
+    """
+    if not settings.operators:
+        settings.exhaustive = True
+        return []
+    solutions = []
+    found = ctypes.c_void_p(create_solution_set())
+    for solution in excluded or ():
+        add_to_solution_set(found, machine_expression(solution).encode())
+    deadline_ns = ctypes.c_longlong(
+        monotonic_ns() + int(settings.seconds_limit * 1e9)
+        if settings.seconds_limit != float("inf") else 0)
+
+    @SOLUTION_CALLBACK
+    def on_solution(solution: bytes) -> int:
+        if len(solutions) >= settings.max_solution_count:
+            return True
+        solution = human_expression(solution.decode())
+        solutions.append(solution)
+        if callback is not None:
+            callback(solution)
+        return len(solutions) >= settings.max_solution_count
+
+    try:
+        status = enumerate_solutions(
+            (ctypes.c_int * len(numbers))(*numbers), len(numbers),
+            settings.min_number_count, settings.max_number_count, target,
+            settings.operators.encode(), settings.parentheses_option,
+            settings.integer_only, on_solution,
+            ctypes.byref(settings.cancel), deadline_ns, found)
+    finally:
+        free_solution_set(found)
+
+    settings.exhaustive = (
+        status >= 0 and len(solutions) < settings.max_solution_count
+        and not settings.cancel.value)
+    return solutions if not settings.cancel.value else []
+
+
+class RoundHints:
+    """
+    What is known about solving a round, found in the background
+    while it is being played:
+    - Whether the round is solvable at all (None if not known in time).
+    - The fewest numbers needed to reach the target, if known,
+    and an example expression using that many numbers.
+    - A few solutions, as the solutions screen would find by default.
+    """
 
-    while (
-        timer() - start < settings.seconds_limit
-        and perms and len(solutions) < settings.max_solution_count
-    ):
-        count_choice = secrets.choice(perms)
-        choice = secrets.choice(count_choice)
-        perms[perms.index(count_choice)].remove(choice)
-        filename = "".join(
-            secrets.choice(POSSIBLE_SOLUTION_FILENAME_CHARACTERS)
-            for _ in range(SOLUTION_FILENAME_LENGTH))
-        file_path = f"{TEMPORARY_FOLDER}/{filename}"
-
-        if [] in perms:
-            perms.remove([])
-
-        create_temp_folder()
-        get_solution(
-            (ctypes.c_int * len(choice))(*choice), len(choice), target,
-            operators, settings.parentheses_option, file_path.encode())
-
-        with suppress(FileNotFoundError):
-            with open(file_path, "r", encoding="utf8") as f:
-                solution = f.read()
-            solutions.append(human_expression(solution))
-            os.remove(file_path)
-        if settings.cancel:
-            return []
-
-    return solutions if not settings.cancel else []
+    def __init__(self, numbers: list[int], target: int) -> None:
+        self.numbers = numbers
+        self.target = target
+        self.settings = SolutionGenerationSettings(
+            MIN_SOLUTION_NUMBER_COUNT, MAX_SOLUTION_NUMBER_COUNT,
+            DEFAULT_SOLUTION_COUNT, DEFAULT_SOLUTION_PARENTHESES_OPTION,
+            machine_expression(OPERATORS), HINTS_SECONDS_LIMIT,
+            parallel=False, find_nearest=True, uniform=True)
+        self.solvable = None
+        self.min_number_count = None
+        self.example = None
+        self.solutions = []
+        # Set once finding the hints is over, even if stopped early.
+        self.finished = threading.Event()
+
+    def find_in_background(self) -> None:
+        """
+        Starts finding the hints in a background thread.
+        The C++ searches release the GIL, so the GUI is not held up.
+        """
+        threading.Thread(target=self.find, daemon=True).start()
+
+    def find(self) -> None:
+        """
+        Finds the hints, stopping early if cancelled or out of time.
+        Solutions found are added to the solution cache.
+        """
+        deadline_ns = monotonic_ns() + int(HINTS_SECONDS_LIMIT * 1e9)
+        try:
+            self.find_min_number_count(deadline_ns)
+            if not self.settings.cancel.value:
+                self.find_solutions(deadline_ns)
+        finally:
+            self.finished.set()
+
+    def find_min_number_count(self, deadline_ns: int) -> None:
+        """
+        Finds the fewest numbers needed to reach the target
+        (without fractions) in C++, along with an example.
+        """
+        try:
+            reachability = ReachabilityMap(
+                self.numbers, self.target, self.target,
+                cancel=self.settings.cancel, deadline_ns=deadline_ns)
+        except TimeoutError:
+            return
+        self.min_number_count = reachability.get_number_count(self.target)
+        self.example = reachability.get_witness(self.target)
+        reachability.close()
+        if self.min_number_count is not None:
+            self.solvable = True
+
+    def find_solutions(self, deadline_ns: int) -> None:
+        """
+        Finds a few solutions with the rest of the time available.
+        """
+        self.settings.seconds_limit = max(
+            (deadline_ns - monotonic_ns()) / 1e9, 0)
+        self.solutions = generate_solutions(
+            self.numbers, self.target, self.settings)
+        if self.settings.cancel.value:
+            return
+        add_cached_solutions(
+            self.settings.get_cache_key(self.numbers, self.target),
+            self.solutions, self.settings.exhaustive, self.settings.nearest)
+        if self.solvable:
+            return
+        if self.solutions:
+            # Only reachable with fractions along the way.
+            counts = [
+                len(analyse_solution(solution).numbers)
+                for solution in self.solutions]
+            self.min_number_count = min(counts)
+            self.example = self.solutions[counts.index(min(counts))]
+            self.solvable = True
+        elif self.settings.exhaustive:
+            self.solvable = False
+
+    def cancel(self) -> None:
+        """
+        Stops finding the hints, if still in progress.
+        """
+        self.settings.cancel.value = True
+
+
+def load_solution_cache() -> dict:
+    """
+    Gets the solution cache: key -> solutions, whether exhaustive
+    and the nearest expression if unsolvable, in order of use
+    (least recent first).
+    """
+    try:
+        with gzip.open(SOLUTION_CACHE_FILE, "rt", encoding="utf8") as f:
+            cache = json.load(f)
+        if not isinstance(cache, dict):
+            raise ValueError
+        return cache
+    except (OSError, EOFError, ValueError):
+        # Not created yet or corrupt, so start again.
+        return {}
+
+
+def save_solution_cache(cache: dict) -> None:
+    """
+    Saves the solution cache, first recording the keys read since
+    it was last saved as the most recently used. Only the most recently
+    used entries within the size limit are kept.
+    """
+    for key in recently_read_keys:
+        if key in cache:
+            cache[key] = cache.pop(key)
+    recently_read_keys.clear()
+    sizes = {
+        key: len(json.dumps({key: entry}, separators=(",", ":")))
+        for key, entry in cache.items()}
+    size = sum(sizes.values())
+    for key in tuple(cache):
+        if size <= MAX_SOLUTION_CACHE_BYTES:
+            break
+        size -= sizes[key]
+        del cache[key]
+    with gzip.open(SOLUTION_CACHE_FILE, "wt", encoding="utf8") as f:
+        json.dump(cache, f, separators=(",", ":"))
+
+
+@check_folder_exists()
+def get_cached_solutions(
+    key: str
+) -> tuple[list[str], bool, tuple[str, int] | None] | None:
+    """
+    Gets the solutions already found for a cache key, whether
+    the search was exhaustive, and the nearest expression with its
+    value (only known if exhaustive without solutions),
+    or None if not cached.
+    """
+    with solution_cache_lock:
+        entry = load_solution_cache().get(key)
+        if entry is None:
+            return None
+        # Now the most recently used.
+        recently_read_keys.pop(key, None)
+        recently_read_keys[key] = True
+    nearest = entry.get("nearest")
+    return (
+        entry["solutions"], entry["exhaustive"],
+        tuple(nearest) if nearest is not None else None)
+
+
+@check_folder_exists()
+def add_cached_solutions(
+    key: str, solutions: list[str], exhaustive: bool,
+    nearest: tuple[str, int] | None = None
+) -> None:
+    """
+    Adds newly found solutions for a cache key.
+    Once exhaustive, no more solutions can be found for the key,
+    so the nearest expression (if found) is also kept if unsolvable.
+    """
+    with solution_cache_lock:
+        cache = load_solution_cache()
+        entry = cache.get(key, {"solutions": [], "exhaustive": False})
+        entry["solutions"].extend(
+            solution for solution in solutions
+            if solution not in entry["solutions"])
+        entry["exhaustive"] = entry["exhaustive"] or exhaustive
+        if exhaustive and nearest is not None and not entry["solutions"]:
+            entry["nearest"] = list(nearest)
+        cache[key] = entry
+        # Now the most recently used, even compared to keys read before.
+        recently_read_keys.pop(key, None)
+        recently_read_keys[key] = True
+        save_solution_cache(cache)
 
 
 class SolutionsFrame(tk.Frame):
@@ -149,6 +695,7 @@ class SolutionsFrame(tk.Frame):
         self.solutions_options_frame = SolutionsOptionsFrame(self)
         self.solutions_listbox = tk.Listbox(
             self, font=ink_free(15), width=25, height=10, bg=GREEN, border=5)
+        self.progress_label = tk.Label(self, font=ink_free(15), width=25)
         self.navigation_frame = SolutionsNavigationFrame(self)
 
         self.title_label.grid(row=0, column=0, columnspan=3, padx=10, pady=5)
@@ -159,12 +706,25 @@ class SolutionsFrame(tk.Frame):
         self.solutions_options_frame.grid(
             row=2, column=1, padx=10, pady=5, sticky="w")
         self.solutions_listbox.grid(row=2, column=2, padx=10, pady=5)
+        self.progress_label.grid(row=3, column=2, padx=10)
         self.navigation_frame.grid(
-            row=3, column=0, columnspan=3, padx=10, pady=10)
+            row=4, column=0, columnspan=3, padx=10, pady=10)
+
+    def show_hints(self, hints: RoundHints) -> None:
+        """
+        Displays the solutions found during the round, unless
+        solutions have already been generated on this screen.
+        """
+        if self.settings is not None or self.solutions_listbox.size():
+            return
+        self.solutions_listbox.insert("end", *hints.solutions)
+        self.progress_label.config(
+            text=f"Found during round: {len(hints.solutions)}")
 
     def generate(self) -> None:
         """
-        Generates solutions and displays them in the listbox.
+        Generates solutions in the background, displaying them
+        in the listbox as they are found.
         """
         options = self.solutions_options_frame
         min_number_count = options.min_number_count_frame.count.get()
@@ -182,7 +742,8 @@ class SolutionsFrame(tk.Frame):
 
         settings = SolutionGenerationSettings(
                 min_number_count, max_number_count, max_solution_count,
-                nested_parentheses, operators, seconds_limit)
+                nested_parentheses, operators, seconds_limit,
+                find_nearest=True, uniform=True)
         self.settings = settings
 
         SOLUTION_FOUND_SFX.stop()
@@ -190,14 +751,85 @@ class SolutionsFrame(tk.Frame):
         self.solutions_listbox.delete(0, "end")
         self.navigation_frame.cancel_generate_button()
 
-        solutions = generate_solutions(self.numbers, self.target, settings)
-        if self.settings is None:
+        found = queue.Queue()
+        threading.Thread(
+            target=self.search, args=(settings, found), daemon=True).start()
+        self.show_solutions(settings, found, timer())
+
+    def search(
+        self, settings: SolutionGenerationSettings, found: queue.Queue
+    ) -> None:
+        """
+        Generates solutions (in a background thread), putting each one
+        into the queue once found, and then indicating completion.
+        Solutions already found are queued straight away, only searching
+        for more if needed and possible. An unsolvable round is only
+        searched again if its nearest expression was not cached.
+        New solutions are cached, even if cancelled.
+        """
+        key = settings.get_cache_key(self.numbers, self.target)
+        cached, exhaustive, nearest = (
+            get_cached_solutions(key) or ([], False, None))
+        for solution in cached[:settings.max_solution_count]:
+            found.put(solution)
+        settings.max_solution_count -= min(
+            len(cached), settings.max_solution_count)
+        settings.nearest = nearest
+        missing_nearest = (
+            exhaustive and not cached and nearest is None
+            and settings.find_nearest)
+        if (
+            (not exhaustive or missing_nearest)
+            and settings.max_solution_count
+        ):
+            new_solutions = []
+
+            def add(solution: str) -> None:
+                new_solutions.append(solution)
+                found.put(solution)
+
+            generate_solutions(
+                self.numbers, self.target, settings, add, set(cached))
+            add_cached_solutions(
+                key, new_solutions, settings.exhaustive, settings.nearest)
+        found.put(GENERATION_FINISHED)
+
+    def show_solutions(
+        self, settings: SolutionGenerationSettings, found: queue.Queue,
+        start: float
+    ) -> None:
+        """
+        Moves solutions found so far into the listbox and displays
+        progress, until generation is finished or cancelled.
+        """
+        if self.settings is not settings:
+            # Cancelled.
+            return
+        finished = False
+        while not found.empty():
+            solution = found.get()
+            if solution is GENERATION_FINISHED:
+                finished = True
+                break
+            self.solutions_listbox.insert("end", solution)
+        count = self.solutions_listbox.size()
+        self.progress_label.config(
+            text=f"Found: {count} ({timer() - start:.1f}s)")
+        if not finished:
+            self.after(
+                SOLUTIONS_REFRESH_RATE_MS,
+                lambda: self.show_solutions(settings, found, start))
             return
         self.navigation_frame.reset_generate_button()
-        if solutions:
-            self.solutions_listbox.insert(0, *solutions)
+        if count:
             SOLUTION_FOUND_SFX.play()
         else:
+            if settings.nearest is not None:
+                # Near miss instead.
+                solution, value = settings.nearest
+                self.solutions_listbox.insert("end", f"{solution} = {value}")
+                self.progress_label.config(
+                    text=f"Closest: {abs(value - self.target)} away")
             NO_SOLUTION_FOUND_SFX.play()
 
     def cancel(self) -> None:
@@ -208,11 +840,20 @@ class SolutionsFrame(tk.Frame):
             # Something weird has happened due to threading. Ignore.
             return
         # Settings cancelled so thread does not return any solutions.
-        self.settings.cancel = True
+        self.settings.cancel.value = True
         # Does not affect actual settings object.
         self.settings = None
         self.navigation_frame.reset_generate_button()
 
+    def destroy(self) -> None:
+        """
+        Stops any generation in progress along with the frame itself.
+        """
+        if self.settings is not None:
+            self.settings.cancel.value = True
+            self.settings = None
+        super().destroy()
+
 
 class SolutionsOptionsFrame(tk.Frame):
     """
@@ -385,9 +1026,7 @@ class SolutionsNavigationFrame(tk.Frame):
         self.master = master
         self.generate_button = tk.Button(
             self, font=ink_free(25), text="Generate", width=15, border=3,
-            bg=ORANGE, activebackground=GREEN,
-            command=lambda: threading.Thread(
-                target=self.master.generate, daemon=True).start())
+            bg=ORANGE, activebackground=GREEN, command=master.generate)
 
         self.back_button = tk.Button(
             self, font=ink_free(25), text="Back", width=15, border=3,
@@ -403,8 +1042,7 @@ class SolutionsNavigationFrame(tk.Frame):
         """
         self.generate_button.config(
             text="Generate", bg=ORANGE, activebackground=GREEN,
-            command=lambda: threading.Thread(
-                target=self.master.generate, daemon=True).start())
+            command=self.master.generate)
 
     def cancel_generate_button(self) -> None:
         """
@@ -13,11 +13,12 @@ from utils.io import FOLDER, check_folder_exists
 from utils.utils import days_to_seconds, seconds_to_hhmmss, ink_free
 from . import history
 from . import level
+from .targets import DIFFICULTY_LEVELS
 
 
 OPERATORS = "+-x÷"
 TIME_CATEGORIES = ("Last 24 hours", "Last 7 days", "Last 30 days", "All time")
-PAGE_COUNT = 3
+PAGE_COUNT = 4
 
 STATS_FOLDER = f"{FOLDER}/stats"
 XP_FILE = f"{STATS_FOLDER}/xp.dat"
@@ -197,7 +198,10 @@ def get_all_stats(games: list[dict], seconds: int) -> dict:
         "operators_used": dict.fromkeys(OPERATORS, 0),
         "big_numbers": 0,
         "small_numbers": 0,
-        "xp_earned": 0
+        "xp_earned": 0,
+        # Games played and won at each difficulty level (if recorded).
+        "difficulty_games": [0] * len(DIFFICULTY_LEVELS),
+        "difficulty_wins": [0] * len(DIFFICULTY_LEVELS)
     }
     current_time = time.time()
     for game in games:
@@ -216,9 +220,25 @@ def get_all_stats(games: list[dict], seconds: int) -> dict:
         stats_data["big_numbers"] += game["big_numbers"]
         stats_data["small_numbers"] += game["small_numbers"]
         stats_data["xp_earned"] += game["xp_earned"]
+
+        if "difficulty" in game:
+            level = game["difficulty"][0]
+            stats_data["difficulty_games"][level] += 1
+            if game["is_win"]:
+                stats_data["difficulty_wins"][level] += 1
     return stats_data
 
 
+def get_win_rates(games: list[int], wins: list[int]) -> list[str]:
+    """
+    Formats the win rate at each difficulty level as a percentage,
+    or a dash if no games were played at that level.
+    """
+    return [
+        f"{round(100 * won / played)}%" if played else "-"
+        for played, won in zip(games, wins)]
+
+
 class StatisticsWindow(tk.Frame):
     """
     Allows the player to view statistics of their gameplay.
@@ -349,6 +369,49 @@ class OperatorsUsedLabelFrame(tk.LabelFrame):
                     label.grid(row=row, column=column)
 
 
+class WinRateByDifficultyLabelFrame(tk.LabelFrame):
+    """
+    Holds a table showing the win rate at each difficulty level
+    over time (only from recent games, which record the difficulty).
+    """
+
+    def __init__(
+        self, master: tk.Frame, last_24_hours: list[str],
+        last_7_days: list[str], last_30_days: list[str]
+    ) -> None:
+        super().__init__(
+            master, font=ink_free(25, True),
+            text="Win rate by difficulty", labelanchor="n", padx=10, pady=5)
+
+        difficulty_headings = (
+            tk.Label(
+                self, font=ink_free(15, True), width=10,
+                text=difficulty, anchor="e")
+            for difficulty in DIFFICULTY_LEVELS)
+
+        values = (last_24_hours, last_7_days, last_30_days)
+        self.parts = (
+            [
+                tk.Label(
+                    self, font=ink_free(12),
+                    text=f"{category}:", width=15, anchor="e")] +
+            [
+                tk.Label(
+                    self, font=ink_free(12), text=rate, anchor="e", width=10)
+                for rate in value]
+            for value, category in zip(values, TIME_CATEGORIES))
+
+        for column, heading in enumerate(difficulty_headings, 1):
+            heading.grid(row=0, column=column)
+        for row, part in enumerate(self.parts, 1):
+            for column, label in enumerate(part):
+                if column == 0:
+                    # Category
+                    label.grid(row=row, column=column, padx=5, pady=5)
+                else:
+                    label.grid(row=row, column=column)
+
+
 class BestWinStreakLabelFrame(tk.LabelFrame):
     """
     Displays the best win streak ever achieved by the player.
@@ -440,4 +503,20 @@ class StatisticsPagesFrame(widgets.PagesFrame):
         best_win_streak_frame.pack(padx=10, pady=10)
         self.add(third_page)
 
+        fourth_page = tk.Frame(self)
+        win_rate_by_difficulty_frame = WinRateByDifficultyLabelFrame(
+            fourth_page,
+            get_win_rates(
+                last_24_hours_data["difficulty_games"],
+                last_24_hours_data["difficulty_wins"]),
+            get_win_rates(
+                last_7_days_data["difficulty_games"],
+                last_7_days_data["difficulty_wins"]),
+            get_win_rates(
+                last_30_days_data["difficulty_games"],
+                last_30_days_data["difficulty_wins"]))
+
+        win_rate_by_difficulty_frame.pack(padx=10, pady=10)
+        self.add(fourth_page)
+
         self.show()
@@ -0,0 +1,419 @@
+"""
+Precomputed table of possible target numbers for every number selection.
+
+There are only a few thousand possible number selections, so the possible
+targets (valid and not too easy) of each one can be generated in advance
+and looked up instantly instead of being generated at the start of a round.
+There is a separate table for when only integers are allowed.
+The tables are built into the bin folder alongside the C++ library
+(run from the src folder):
+python -m mechanics.targets
+
+Table format:
+- Magic bytes.
+- Version (unsigned 16-bit), so a table built by an older version
+is never used (see TABLE_VERSION).
+- Index: one unsigned 16-bit record number per possible slot
+(no record if 0xFFFF). Slot is obtained from the small numbers
+selected and the count of each big number.
+- Records: bitset of possible targets from 201-999 (bit 0 is 201).
+"""
+import ctypes
+import functools
+import itertools
+import math
+import mmap
+import secrets
+import struct
+
+from utils.utils import BIN_FOLDER, human_expression, load_cpp_library
+
+
+TARGETS_FILE = BIN_FOLDER / "targets.bin"
+INTEGER_TARGETS_FILE = BIN_FOLDER / "integer_targets.bin"
+MAGIC = b"CDTT"
+# Increment whenever the table format or the possible targets generated
+# in C++ change, so that old tables are rebuilt rather than trusted.
+TABLE_VERSION = 1
+VERSION_FORMAT = "<H"
+
+MIN_TARGET = 201
+MAX_TARGET = 999
+TARGET_COUNT = MAX_TARGET - MIN_TARGET + 1
+RECORD_SIZE = (TARGET_COUNT + 7) // 8
+
+# Mirrors the possible number selections of the game.
+NUMBER_COUNT = 7
+SMALL_NUMBERS = tuple(range(2, 10))
+BIG_NUMBERS = (25, 50, 75, 100)
+MAX_BIG_NUMBER_COPIES = 2
+MIN_SMALL_COUNT = 2
+MAX_SMALL_COUNT = 5
+
+BIG_CODE_COUNT = (MAX_BIG_NUMBER_COPIES + 1) ** len(BIG_NUMBERS)
+SLOT_COUNT = (1 << len(SMALL_NUMBERS)) * BIG_CODE_COUNT
+NO_RECORD = 0xFFFF
+INDEX_FORMAT = f"<{SLOT_COUNT}H"
+INDEX_OFFSET = len(MAGIC) + struct.calcsize(VERSION_FORMAT)
+HEADER_SIZE = INDEX_OFFSET + struct.calcsize(INDEX_FORMAT)
+
+# From easiest to hardest.
+DIFFICULTY_LEVELS = ("Very easy", "Easy", "Medium", "Hard", "Very hard")
+# Lowest log10 of the fraction of expression trees reaching the target
+# for each level but the hardest: the quintiles of that log over 2000
+# random rounds (2 to 5 small numbers, the rest big, with a target from
+# the target table), so each level is about a fifth of rounds.
+DIFFICULTY_THRESHOLDS = (-3.87, -4.06, -4.2, -4.37)
+
+
+_get_possible_numbers = load_cpp_library("generate.so").get_possible_numbers
+_get_possible_numbers.restype = ctypes.c_int
+
+_create_reachability_map = (
+    load_cpp_library("generate.so").create_reachability_map)
+_create_reachability_map.restype = ctypes.c_void_p
+_get_reachability_entries = (
+    load_cpp_library("generate.so").get_reachability_entries)
+_get_reachability_entries.argtypes = (ctypes.c_void_p,)
+_get_reachability_entries.restype = ctypes.c_void_p
+_get_reachability_arena = (
+    load_cpp_library("generate.so").get_reachability_arena)
+_get_reachability_arena.argtypes = (ctypes.c_void_p,)
+_get_reachability_arena.restype = ctypes.c_void_p
+_get_reachability_arena_size = (
+    load_cpp_library("generate.so").get_reachability_arena_size)
+_get_reachability_arena_size.argtypes = (ctypes.c_void_p,)
+_get_reachability_arena_size.restype = ctypes.c_int
+_free_reachability_map = load_cpp_library("generate.so").free_reachability_map
+_free_reachability_map.argtypes = (ctypes.c_void_p,)
+
+_estimate_difficulty = load_cpp_library("generate.so").estimate_difficulty
+_estimate_difficulty.argtypes = (
+    ctypes.POINTER(ctypes.c_int), ctypes.c_int, ctypes.c_int,
+    ctypes.POINTER(ctypes.c_longlong), ctypes.POINTER(ctypes.c_int),
+    ctypes.POINTER(ctypes.c_double))
+
+
+def get_native_possible_targets(
+    numbers: list[int], integer_only: bool = False) -> list[int]:
+    """
+    Generates the possible target numbers for the numbers in C++
+    (slow path, and the source of truth for the table).
+    """
+    possible = (ctypes.c_int * TARGET_COUNT)()
+    count = _get_possible_numbers(
+        (ctypes.c_int * NUMBER_COUNT)(*numbers), possible, integer_only)
+    return possible[:count]
+
+
+def get_slot(numbers: list[int]) -> int | None:
+    """
+    Gets the table slot of a number selection,
+    or None if the selection cannot be in the table.
+    """
+    if len(numbers) != NUMBER_COUNT:
+        return None
+    small_mask = 0
+    big_counts = [0] * len(BIG_NUMBERS)
+    for number in numbers:
+        if number in SMALL_NUMBERS:
+            bit = 1 << SMALL_NUMBERS.index(number)
+            if small_mask & bit:
+                # Small numbers are always distinct.
+                return None
+            small_mask |= bit
+        elif number in BIG_NUMBERS:
+            big_counts[BIG_NUMBERS.index(number)] += 1
+        else:
+            return None
+    if (
+        max(big_counts) > MAX_BIG_NUMBER_COPIES
+        or not MIN_SMALL_COUNT <= small_mask.bit_count() <= MAX_SMALL_COUNT
+    ):
+        return None
+    big_code = 0
+    for count in big_counts:
+        big_code = big_code * (MAX_BIG_NUMBER_COPIES + 1) + count
+    return small_mask * BIG_CODE_COUNT + big_code
+
+
+def get_number_selections() -> list[list[int]]:
+    """
+    Gets every possible number selection (order does not matter).
+    """
+    selections = []
+    big_numbers = BIG_NUMBERS * MAX_BIG_NUMBER_COPIES
+    for small_count in range(MIN_SMALL_COUNT, MAX_SMALL_COUNT + 1):
+        big_selections = sorted(set(
+            itertools.combinations(
+                sorted(big_numbers), NUMBER_COUNT - small_count)))
+        for small in itertools.combinations(SMALL_NUMBERS, small_count):
+            for big in big_selections:
+                selections.append(list(small + big))
+    return selections
+
+
+def targets_to_record(targets: list[int]) -> bytes:
+    """
+    Converts possible target numbers into a bitset record.
+    """
+    bits = 0
+    for target in targets:
+        bits |= 1 << (target - MIN_TARGET)
+    return bits.to_bytes(RECORD_SIZE, "little")
+
+
+def record_to_targets(record: bytes) -> list[int]:
+    """
+    Converts a bitset record back into possible target numbers.
+    """
+    bits = int.from_bytes(record, "little")
+    return [
+        MIN_TARGET + i for i in range(TARGET_COUNT) if bits >> i & 1]
+
+
+def pick_target(record: bytes, excluded: list[int] | None = None) -> int | None:
+    """
+    Picks a random target number from a bitset record, apart from
+    any excluded, or None if there are none left. Instead of listing
+    every target, the kth set bit (k random, below the count of set bits)
+    is found by a binary search on the count of set bits below each bit.
+    """
+    bits = int.from_bytes(record, "little")
+    for target in excluded or ():
+        if MIN_TARGET <= target <= MAX_TARGET:
+            bits &= ~(1 << (target - MIN_TARGET))
+    count = bits.bit_count()
+    if not count:
+        return None
+    k = secrets.randbelow(count)
+    low = 0
+    high = TARGET_COUNT - 1
+    while low < high:
+        middle = (low + high) // 2
+        if (bits & ((2 << middle) - 1)).bit_count() > k:
+            high = middle
+        else:
+            low = middle + 1
+    return MIN_TARGET + low
+
+
+def build_target_table(
+    file: str = TARGETS_FILE, integer_only: bool = False) -> int:
+    """
+    Generates the possible targets of every number selection in C++
+    and writes them to the table file. Returns the record count.
+    """
+    index = [NO_RECORD] * SLOT_COUNT
+    records = []
+    for numbers in get_number_selections():
+        index[get_slot(numbers)] = len(records)
+        records.append(
+            targets_to_record(
+                get_native_possible_targets(numbers, integer_only)))
+    with open(file, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack(VERSION_FORMAT, TABLE_VERSION))
+        f.write(struct.pack(INDEX_FORMAT, *index))
+        f.write(b"".join(records))
+    return len(records)
+
+
+class TargetTable:
+    """
+    Read-only, memory-mapped target table.
+    Only the index and the records looked up are actually read from disk.
+    """
+
+    def __init__(self, file: str = TARGETS_FILE) -> None:
+        with open(file, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.data[:len(MAGIC)] != MAGIC:
+            self.data.close()
+            raise ValueError("Not a target table.")
+        if (
+            len(self.data) < HEADER_SIZE
+            or struct.unpack_from(
+                VERSION_FORMAT, self.data, len(MAGIC))[0] != TABLE_VERSION
+        ):
+            self.data.close()
+            raise ValueError("Target table is out of date.")
+
+    def get_record(self, numbers: list[int]) -> bytes | None:
+        """
+        Gets the bitset record of a number selection,
+        or None if the selection is not in the table.
+        """
+        slot = get_slot(numbers)
+        if slot is None:
+            return None
+        record, = struct.unpack_from(
+            "<H", self.data, INDEX_OFFSET + 2 * slot)
+        if record == NO_RECORD:
+            return None
+        start = HEADER_SIZE + record * RECORD_SIZE
+        if start + RECORD_SIZE > len(self.data):
+            return None
+        return self.data[start:start + RECORD_SIZE]
+
+    def get_targets(self, numbers: list[int]) -> list[int] | None:
+        """
+        Gets the possible target numbers of a number selection,
+        or None if the selection is not in the table.
+        """
+        record = self.get_record(numbers)
+        return record_to_targets(record) if record is not None else None
+
+    def get_random_target(
+        self, numbers: list[int], excluded: list[int] | None = None
+    ) -> int | None:
+        """
+        Picks a random possible target number of a number selection
+        straight from its record (see pick_target), or None if the
+        selection is not in the table or every target is excluded.
+        """
+        record = self.get_record(numbers)
+        return pick_target(record, excluded) if record is not None else None
+
+
+class ReachabilityMap:
+    """
+    Every value in a range reachable with some numbers (any of them),
+    generated in C++ in one call: the fewest numbers needed and an
+    example expression for each, looked up without copying.
+    Intermediate results are always integers (division only without
+    a remainder), and if only integers are allowed, positive integers.
+    """
+
+    def __init__(
+        self, numbers: list[int], min_value: int = MIN_TARGET,
+        max_value: int = MAX_TARGET, integer_only: bool = False,
+        cancel: ctypes.c_int | None = None, deadline_ns: int = 0
+    ) -> None:
+        self.min_value = min_value
+        self.max_value = max_value
+        self.map = _create_reachability_map(
+            (ctypes.c_int * len(numbers))(*numbers), len(numbers),
+            min_value, max_value, integer_only,
+            ctypes.byref(cancel) if cancel is not None else None,
+            ctypes.c_longlong(deadline_ns))
+        if self.map is None:
+            raise TimeoutError("Reachability map generation stopped early.")
+        # Views of memory owned by C++, until closed.
+        self.entries = memoryview((
+            ctypes.c_int * ((max_value - min_value + 1) * 2)).from_address(
+                _get_reachability_entries(self.map))).cast("B").cast("i")
+        self.arena = memoryview((
+            ctypes.c_char * _get_reachability_arena_size(self.map)
+        ).from_address(_get_reachability_arena(self.map))).cast("B")
+
+    def get_number_count(self, value: int) -> int | None:
+        """
+        Gets the fewest numbers needed to reach a value,
+        or None if it cannot be reached (or is out of range).
+        """
+        if not self.min_value <= value <= self.max_value:
+            return None
+        return self.entries[(value - self.min_value) * 2] or None
+
+    def get_witness(self, value: int) -> str | None:
+        """
+        Gets an expression reaching a value with the fewest numbers,
+        or None if it cannot be reached (or is out of range).
+        """
+        if self.get_number_count(value) is None:
+            return None
+        start = self.entries[(value - self.min_value) * 2 + 1]
+        end = start
+        while self.arena[end]:
+            end += 1
+        return human_expression(bytes(self.arena[start:end]).decode())
+
+    def close(self) -> None:
+        """
+        Frees the map in C++. It can no longer be used.
+        """
+        if self.map is not None:
+            self.entries.release()
+            self.arena.release()
+            _free_reachability_map(self.map)
+            self.map = None
+
+
+class Difficulty:
+    """
+    How hard it is to reach a target with some numbers (any of them),
+    estimated in C++ from every expression tree with positive integer
+    intermediate results (as in the real game):
+    - The number of trees reaching the target (distinct solutions,
+    apart from the order of operands of + and x).
+    - The fewest numbers needed, or None if not reachable.
+    - The fraction of all trees reaching the target, i.e. the chance
+    of an expression with random operators reaching it.
+    - The difficulty level (index of DIFFICULTY_LEVELS) from the fraction.
+    """
+
+    def __init__(
+        self, solution_count: int, min_number_count: int | None,
+        fraction: float
+    ) -> None:
+        self.solution_count = solution_count
+        self.min_number_count = min_number_count
+        self.fraction = fraction
+        self.level = (
+            sum(
+                math.log10(fraction) < threshold
+                for threshold in DIFFICULTY_THRESHOLDS)
+            if fraction else len(DIFFICULTY_LEVELS) - 1)
+
+
+@functools.cache
+def estimate_difficulty(numbers: tuple[int], target: int) -> Difficulty:
+    """
+    Estimates the difficulty of a round (see Difficulty) in milliseconds.
+    """
+    solution_count = ctypes.c_longlong()
+    min_number_count = ctypes.c_int()
+    fraction = ctypes.c_double()
+    _estimate_difficulty(
+        (ctypes.c_int * len(numbers))(*numbers), len(numbers), target,
+        solution_count, min_number_count, fraction)
+    return Difficulty(
+        solution_count.value, min_number_count.value or None, fraction.value)
+
+
+# By whether only integers are allowed, once opened.
+_tables = {}
+
+
+def get_random_target(
+    numbers: list[int], integer_only: bool = False,
+    excluded: list[int] | None = None
+) -> int | None:
+    """
+    Picks a random possible target number of a number selection from
+    the table, apart from any excluded (e.g. recent target numbers).
+    None is returned if the table is not available, is out of date or
+    does not contain the selection, or if every target is excluded,
+    in which case generation must fall back to C++.
+    """
+    if integer_only not in _tables:
+        try:
+            _tables[integer_only] = TargetTable(
+                INTEGER_TARGETS_FILE if integer_only else TARGETS_FILE)
+        except OSError:
+            # Not built, so never looked for again.
+            _tables[integer_only] = None
+        except ValueError as e:
+            print(f"{e} Rebuild it with: python -m mechanics.targets")
+            _tables[integer_only] = None
+    if _tables[integer_only] is None:
+        return None
+    return _tables[integer_only].get_random_target(numbers, excluded)
+
+
+if __name__ == "__main__":
+    print(f"Built target table with {build_target_table()} records.")
+    print(
+        "Built integer target table with "
+        f"{build_target_table(INTEGER_TARGETS_FILE, True)} records.")
@@ -1,12 +1,15 @@
 """
 Utility functions for the rest of the application.
 """
+import ast
 import datetime
+import itertools
 import pathlib
 import threading
 import time
 import tkinter as tk
-from ctypes import cdll, c_double, CDLL
+from ctypes import byref, cdll, c_int, c_longlong, CDLL
+from fractions import Fraction
 
 from pygame import mixer
 
@@ -25,6 +28,11 @@ SFX_FOLDER = AUDIO_FOLDER / "sfx"
 LOCKFILE_REFRESH_SECONDS = 0.1
 LOCKFILE_NO_INCREMENT_SECONDS = 0.2
 
+# Solution analysis operators (human form) and their precedence.
+ANALYSIS_OPERATORS = "+-x÷"
+ANALYSIS_OPERATOR_ALIASES = {"*": "x", "/": "÷"}
+ANALYSIS_PRECEDENCE = {"+": 0, "-": 0, "x": 1, "÷": 1}
+
 
 def load_cpp_library(filename: str) -> CDLL:
     """
@@ -34,8 +42,14 @@ def load_cpp_library(filename: str) -> CDLL:
     return cdll.LoadLibrary(str(BIN_FOLDER / filename))
 
 
-fast_eval = load_cpp_library("generate.so").eval
-fast_eval.restype = c_double
+fast_eval_exact = load_cpp_library("generate.so").eval_exact
+fast_eval_exact.restype = c_int
+fast_eval_exact_many = load_cpp_library("generate.so").eval_exact_many
+fast_eval_exact_many.restype = None
+# Returned by C++ if an exact result is invalid.
+EXACT_DIVISION_BY_ZERO = 1
+EXACT_OVERFLOW = 2
+EXACT_INVALID_EXPRESSION = 3
 
 
 def ink_free(size: int, bold: bool = False, italic: bool = False) -> tuple:
@@ -57,13 +71,260 @@ def evaluate(expression: str) -> int | float:
     Not for general purpose - meets the program requirements,
     and that's it. Safer and faster than the built-in eval.
 
-    Calls fast corresponding function written in C++.
+    Exact (see evaluate_exact), only converted to a float at the end
+    if not an integer. NaN if invalid (division by 0 or malformed).
+    """
+    result = evaluate_exact(expression)
+    if result is None:
+        return float("nan")
+    if result.denominator == 1:
+        return result.numerator
+    return float(result)
+
+
+def evaluate_exact(expression: str) -> int | Fraction | None:
+    """
+    Evaluates a simple maths expression with only +/-/*/'/'/()
+    exactly, so there are no floating point errors: an integer,
+    or else a fraction. None is returned if invalid (division by 0,
+    or malformed such as a missing operand or parenthesis).
+
+    Calls fast corresponding function written in C++, unless
+    the result or any part of it is too big for 64-bit integers.
+    """
+    numerator = c_longlong()
+    denominator = c_longlong()
+    status = fast_eval_exact(
+        expression.encode(), byref(numerator), byref(denominator))
+    return _to_fraction(
+        expression, status, numerator.value, denominator.value)
+
+
+def evaluate_many(expressions: list[str]) -> list[int | Fraction | None]:
+    """
+    Evaluates many simple maths expressions exactly (see evaluate_exact).
+    All expressions are packed into one buffer and evaluated in a single
+    call to C++, which is much faster than a call per expression.
+    """
+    if not expressions:
+        return []
+    count = len(expressions)
+    encoded = [expression.encode() for expression in expressions]
+    offsets = (c_int * count)(*itertools.accumulate(
+        (len(expression) + 1 for expression in encoded[:-1]), initial=0))
+    numerators = (c_longlong * count)()
+    denominators = (c_longlong * count)()
+    statuses = (c_int * count)()
+    fast_eval_exact_many(
+        b"\0".join(encoded) + b"\0", offsets, count,
+        numerators, denominators, statuses)
+    return [
+        # Integers (no status, denominator of 1) are the most common.
+        numerator if not status and denominator == 1
+        else _to_fraction(expression, status, numerator, denominator)
+        for expression, status, numerator, denominator in zip(
+            expressions, statuses, numerators[:], denominators[:])]
+
+
+def _to_fraction(
+    expression: str, status: int, numerator: int, denominator: int
+) -> int | Fraction | None:
+    """
+    Gets the value of an expression evaluated in C++ (see evaluate_exact).
+    If too big for C++, it is evaluated in Python instead.
+    """
+    if status in (EXACT_DIVISION_BY_ZERO, EXACT_INVALID_EXPRESSION):
+        return None
+    if status == EXACT_OVERFLOW:
+        try:
+            result = evaluate_fraction(
+                ast.parse(expression, mode="eval").body)
+        except (ZeroDivisionError, SyntaxError):
+            return None
+        return result.numerator if result.denominator == 1 else result
+    if denominator == 1:
+        return numerator
+    return Fraction(numerator, denominator)
+
+
+def evaluate_fraction(node: ast.AST) -> Fraction:
+    """
+    Evaluates a parsed simple maths expression exactly in Python
+    (only numbers, +/-/*/'/' allowed).
+    """
+    if isinstance(node, ast.Constant) and isinstance(node.value, int):
+        return Fraction(node.value)
+    if isinstance(node, ast.BinOp):
+        a = evaluate_fraction(node.left)
+        b = evaluate_fraction(node.right)
+        if isinstance(node.op, ast.Add):
+            return a + b
+        if isinstance(node.op, ast.Sub):
+            return a - b
+        if isinstance(node.op, ast.Mult):
+            return a * b
+        if isinstance(node.op, ast.Div):
+            return a / b
+    raise ValueError("Invalid expression.")
+
+
+class SolutionAnalysis:
+    """
+    Everything about a solution, found in a single pass (see
+    analyse_solution): its exact value, how many times each operator
+    is used, the numbers used and the maximum parentheses depth.
+    """
+
+    def __init__(self) -> None:
+        self.value = None
+        # By human operator (+-x÷), regardless of the form analysed.
+        self.operator_counts = dict.fromkeys(ANALYSIS_OPERATORS, 0)
+        self.numbers = []
+        self.small_numbers = 0
+        self.big_numbers = 0
+        self.max_depth = 0
+
+
+class SolutionEvaluator:
+    """
+    Evaluates a solution exactly as it is entered, one token
+    (number, operator or parenthesis) at a time, keeping operand and
+    operator stacks so nothing is ever re-evaluated from the start.
+    The state before each token is kept so it can be removed again.
+    """
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Removes all tokens.
+        """
+        # Stacks are tuples, so the history can share each state.
+        # Each push still copies both stacks to lists and back, and
+        # get_value applies every pending operator on each call, but
+        # the stacks only hold values and operators not yet applied.
+        self.values = ()
+        self.operators = ()
+        self.division_by_zero = False
+        self.history = []
+
+    def push(self, token: str) -> None:
+        """
+        Adds a number, operator (human or machine form) or parenthesis.
+        """
+        self.history.append(
+            (self.values, self.operators, self.division_by_zero))
+        values = list(self.values)
+        operators = list(self.operators)
+        token = ANALYSIS_OPERATOR_ALIASES.get(token, token)
+        if token in ANALYSIS_OPERATORS:
+            # Higher or equal precedence first (left to right).
+            while (
+                operators and operators[-1] != "("
+                and ANALYSIS_PRECEDENCE[operators[-1]]
+                >= ANALYSIS_PRECEDENCE[token]
+            ):
+                self._apply(values, operators.pop())
+            operators.append(token)
+        elif token == "(":
+            operators.append(token)
+        elif token == ")":
+            while operators[-1] != "(":
+                self._apply(values, operators.pop())
+            operators.pop()
+        else:
+            values.append(int(token))
+        self.values = tuple(values)
+        self.operators = tuple(operators)
+
+    def pop(self) -> None:
+        """
+        Removes the most recently added token.
+        """
+        self.values, self.operators, self.division_by_zero = (
+            self.history.pop())
+
+    def get_value(self) -> int | Fraction | None:
+        """
+        Gets the exact value so far (None if division by 0), treating
+        any parentheses still open as closed. Only valid when the last
+        token is a number or closing parenthesis.
+        """
+        values = list(self.values)
+        is_valid = not self.division_by_zero
+        for operator in reversed(self.operators):
+            if operator != "(":
+                is_valid = apply_operator(values, operator) and is_valid
+        return values[-1] if is_valid else None
+
+    def _apply(self, values: list, operator: str) -> None:
+        # Applies an operator, remembering any division by 0.
+        if not apply_operator(values, operator):
+            self.division_by_zero = True
+
+
+def apply_operator(values: list, operator: str) -> bool:
+    """
+    Replaces the two most recent values with the result of an operator
+    (human form). False if division by 0 (the first value is kept).
+    """
+    b = values.pop()
+    a = values.pop()
+    if operator == "+":
+        values.append(a + b)
+    elif operator == "-":
+        values.append(a - b)
+    elif operator == "x":
+        values.append(a * b)
+    elif b == 0:
+        values.append(a)
+        return False
+    else:
+        value = Fraction(a, b)
+        values.append(value.numerator if value.denominator == 1 else value)
+    return True
+
+
+def analyse_solution(solution: str) -> SolutionAnalysis:
+    """
+    Tokenises and evaluates a solution (human or machine form) in one pass
+    instead of counting operators, numbers and evaluating separately.
+    The value is exact as with evaluate_exact, None if invalid.
+    Order of operations followed.
     """
-    result = fast_eval(expression.encode(), 0, -1)
-    if "/" in expression:
-        result = round(result, 10)
-        return int(result) if result.is_integer() else result
-    return int(result)
+    analysis = SolutionAnalysis()
+    evaluator = SolutionEvaluator()
+    depth = 0
+    number = ""
+
+    # Space purposely added for final check for a number.
+    for char in solution + " ":
+        if char >= "0" and char <= "9":
+            number += char
+            continue
+        if number:
+            analysis.numbers.append(int(number))
+            if len(number) == 1:
+                analysis.small_numbers += 1
+            else:
+                analysis.big_numbers += 1
+            evaluator.push(number)
+            number = ""
+        operator = ANALYSIS_OPERATOR_ALIASES.get(char, char)
+        if operator in ANALYSIS_OPERATORS:
+            analysis.operator_counts[operator] += 1
+        elif operator == "(":
+            depth += 1
+            analysis.max_depth = max(analysis.max_depth, depth)
+        elif operator == ")":
+            depth -= 1
+        else:
+            continue
+        evaluator.push(operator)
+
+    analysis.value = evaluator.get_value()
+    return analysis
 
 
 def draw_circle(
@@ -0,0 +1,70 @@
+"""
+Benchmarks evaluating many expressions with one call to C++ each
+versus a single batch call.
+"""
+import secrets
+import sys
+from timeit import default_timer as timer
+
+sys.path.extend((".", "./src"))
+
+from src.utils import utils
+
+
+EXPRESSION_COUNT = 100_000
+NUMBERS = (2, 3, 4, 5, 6, 7, 8, 9, 25, 50, 75, 100)
+# Any expressions (mostly fractions), and integer expressions
+# (like solutions, which are re-checked).
+OPERATOR_SETS = ("+-*/", "+-*")
+
+
+def generate_expression(number_count: int, operators: str) -> str:
+    """
+    Generates a random expression, possibly with parentheses.
+    """
+    if number_count == 1:
+        return str(secrets.choice(NUMBERS))
+    left_count = 1 + secrets.randbelow(number_count - 1)
+    left = generate_expression(left_count, operators)
+    right = generate_expression(number_count - left_count, operators)
+    if left_count > 1 and secrets.randbelow(2):
+        left = f"({left})"
+    if number_count - left_count > 1 and secrets.randbelow(2):
+        right = f"({right})"
+    return f"{left}{secrets.choice(operators)}{right}"
+
+
+def benchmark(expressions: list[str]) -> None:
+    """
+    Times evaluating the expressions one call at a time and in a batch.
+    """
+    start = timer()
+    for expression in expressions:
+        utils.evaluate(expression)
+    per_call_seconds = timer() - start
+
+    start = timer()
+    for expression in expressions:
+        utils.evaluate_exact(expression)
+    exact_per_call_seconds = timer() - start
+
+    start = timer()
+    utils.evaluate_many(expressions)
+    batch_seconds = timer() - start
+
+    for name, seconds in (
+        ("evaluate (per call)", per_call_seconds),
+        ("evaluate_exact (per call)", exact_per_call_seconds),
+        ("evaluate_many (one call)", batch_seconds)
+    ):
+        print(
+            f"{name}: {seconds:.3f}s "
+            f"({len(expressions) / seconds:.0f} expressions/s)")
+
+
+if __name__ == "__main__":
+    for operators in OPERATOR_SETS:
+        print(f"{EXPRESSION_COUNT} expressions with {operators}")
+        benchmark([
+            generate_expression(2 + secrets.randbelow(6), operators)
+            for _ in range(EXPRESSION_COUNT)])
@@ -0,0 +1,67 @@
+"""
+Measures how many duplicate number orders (and combinations) are skipped
+for selections with repeated big numbers, and how long generating the
+possible targets takes for selections with and without repeats.
+"""
+import math
+import sys
+from timeit import default_timer as timer
+
+sys.path.extend((".", "./src"))
+
+from src.mechanics import solutions
+from src.mechanics import targets
+
+
+MIN_NUMBER_COUNT = 4
+MAX_NUMBER_COUNT = 7
+TARGET_REPEATS = 20
+
+
+def count_all(numbers: list[int], ordered: bool) -> int:
+    """
+    Counts the permutations/combinations treating every number
+    as distinct (the previous behaviour).
+    """
+    return sum(
+        (math.perm if ordered else math.comb)(len(numbers), count)
+        for count in range(MIN_NUMBER_COUNT, MAX_NUMBER_COUNT + 1))
+
+
+def count_distinct(numbers: list[int], ordered: bool) -> int:
+    """
+    Counts the distinct permutations/combinations actually searched.
+    """
+    sampler = solutions.PermutationSampler(
+        numbers, MIN_NUMBER_COUNT, MAX_NUMBER_COUNT, ordered)
+    return sum(sampler.remaining.values())
+
+
+def time_targets(selections: list[list[int]]) -> float:
+    """
+    Average milliseconds to generate the possible targets in C++.
+    """
+    start = timer()
+    for _ in range(TARGET_REPEATS):
+        for numbers in selections:
+            targets.get_native_possible_targets(numbers)
+    return (timer() - start) * 1000 / (TARGET_REPEATS * len(selections))
+
+
+if __name__ == "__main__":
+    selections = targets.get_number_selections()
+    by_repeats = {}
+    for numbers in selections:
+        repeats = len(numbers) - len(set(numbers))
+        by_repeats.setdefault(repeats, []).append(numbers)
+
+    for repeats, group in sorted(by_repeats.items()):
+        print(f"{len(group)} selections with {repeats} repeated number(s):")
+        for ordered, name in ((True, "Permutations"), (False, "Combinations")):
+            before = sum(count_all(numbers, ordered) for numbers in group)
+            after = sum(count_distinct(numbers, ordered) for numbers in group)
+            print(
+                f"  {name}: {before / len(group):.0f} -> "
+                f"{after / len(group):.0f} per selection "
+                f"({1 - after / before:.1%} skipped)")
+        print(f"  Possible targets: {time_targets(group):.3f}ms per selection")
@@ -0,0 +1,81 @@
+"""
+Benchmarks solution generation in C++ when solutions are returned
+through temporary files versus an in-memory buffer.
+"""
+import ctypes
+import itertools
+import os
+import sys
+import tempfile
+from timeit import default_timer as timer
+
+sys.path.extend((".", "./src"))
+
+from src.mechanics import solutions
+from src.utils.utils import load_cpp_library
+
+
+NUMBERS = [3, 6, 8, 25, 50, 75, 100]
+TARGET = 952
+NUMBER_COUNT = 5
+OPERATORS = b"+-*/"
+PARENTHESES_OPTION = 0
+PERMUTATION_COUNT = 2000
+
+
+def file_path_solutions(perms: list[tuple[int]], folder: str) -> list[str]:
+    """
+    Original approach: each solution is written to a temporary file
+    which is then read and deleted.
+    """
+    get_solution = load_cpp_library("generate.so").get_solution
+    found = []
+    for i, perm in enumerate(perms):
+        file_path = f"{folder}/{i}"
+        get_solution(
+            (ctypes.c_int * len(perm))(*perm), len(perm), TARGET,
+            OPERATORS, PARENTHESES_OPTION, file_path.encode())
+        if os.path.exists(file_path):
+            with open(file_path, "r", encoding="utf8") as f:
+                found.append(f.read())
+            os.remove(file_path)
+    return found
+
+
+def buffer_solutions(perms: list[tuple[int]]) -> list[str]:
+    """
+    New approach: each solution is written into one reused buffer.
+    """
+    buffer = ctypes.create_string_buffer(solutions.SOLUTION_BUFFER_SIZE)
+    found = []
+    for perm in perms:
+        if solutions.get_solution(
+            (ctypes.c_int * len(perm))(*perm), len(perm), TARGET,
+            OPERATORS, PARENTHESES_OPTION, False,
+            buffer, solutions.SOLUTION_BUFFER_SIZE, None, ctypes.c_longlong(0),
+            None, None, None
+        ) > 0:
+            found.append(buffer.value.decode())
+    return found
+
+
+if __name__ == "__main__":
+    perms = list(itertools.islice(
+        itertools.permutations(NUMBERS, NUMBER_COUNT), PERMUTATION_COUNT))
+    with tempfile.TemporaryDirectory() as folder:
+        start = timer()
+        file_path_found = file_path_solutions(perms, folder)
+        file_path_seconds = timer() - start
+    start = timer()
+    buffer_found = buffer_solutions(perms)
+    buffer_seconds = timer() - start
+
+    print(f"{len(perms)} permutations of {NUMBER_COUNT} numbers -> {TARGET}")
+    for name, found, seconds in (
+        ("Temporary files", file_path_found, file_path_seconds),
+        ("Buffer", buffer_found, buffer_seconds)
+    ):
+        print(
+            f"{name}: {len(found)} solutions in {seconds:.3f}s "
+            f"({len(found) / seconds:.1f} solutions/s, "
+            f"{len(perms) / seconds:.1f} permutations/s)")
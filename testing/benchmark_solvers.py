@@ -0,0 +1,55 @@
+"""
+Benchmarks the template solver (permutations with every operator and
+parentheses combination) against the pairwise solver (combining two
+values at a time with pruning), and the template solver streaming
+every solution from a single call to C++.
+"""
+import sys
+from timeit import default_timer as timer
+
+sys.path.extend((".", "./src"))
+
+from src.mechanics import solutions
+
+
+NUMBERS = [3, 6, 8, 25, 50, 75, 100]
+# Reachable, and not reachable (so every possibility is searched).
+TARGETS = (952, 10 ** 9)
+MIN_NUMBER_COUNT = 4
+MAX_NUMBER_COUNT = 6
+MAX_SOLUTION_COUNT = 50
+SECONDS_LIMIT = 60
+
+
+STREAMED = "streamed templates"
+
+
+def benchmark(solver: str, target: int) -> tuple[int, float, bool]:
+    """
+    Generates solutions with a solver on one thread, returning
+    the solution count, seconds taken and if the search was exhaustive.
+    """
+    settings = solutions.SolutionGenerationSettings(
+        MIN_NUMBER_COUNT, MAX_NUMBER_COUNT, MAX_SOLUTION_COUNT, True,
+        "+-*/", SECONDS_LIMIT, parallel=False,
+        solver=solver if solver != STREAMED else solutions.TEMPLATE_SOLVER)
+    start = timer()
+    if solver == STREAMED:
+        found = solutions.stream_solutions(NUMBERS, target, settings)
+    else:
+        found = solutions.generate_solutions(NUMBERS, target, settings)
+    return len(found), timer() - start, settings.exhaustive
+
+
+if __name__ == "__main__":
+    for target in TARGETS:
+        print(
+            f"{NUMBERS} -> {target} "
+            f"({MIN_NUMBER_COUNT}-{MAX_NUMBER_COUNT} numbers)")
+        for solver in (
+            solutions.TEMPLATE_SOLVER, solutions.PAIRWISE_SOLVER, STREAMED
+        ):
+            count, seconds, exhaustive = benchmark(solver, target)
+            print(
+                f"{solver}: {count} solutions in {seconds:.3f}s"
+                f"{' (exhaustive)' if exhaustive else ''}")
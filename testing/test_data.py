@@ -1,7 +1,9 @@
+import json
 import unittest
 import sys
 import random
 import time
+from unittest import mock
 
 sys.path.extend((".", "./src"))
 
@@ -12,6 +14,8 @@ from src.mechanics import history
 from src.utils.io import reset_data
 from src.utils.utils import days_to_seconds
 from src.mechanics import achievements
+from src.mechanics import solutions
+from src.mechanics import targets
 from src.mechanics.options import get_options, set_options
 
 
@@ -93,6 +97,71 @@ class TestData(unittest.TestCase):
                 max(1000, new_count) if total_count >= 1000 else total_count)
             reset_data()
     
+    def test_difficulty(self):
+        reset_data()
+        end.GameData([3, 6, 8, 25, 50, 75, 100], 952, None, 0, 30).save()
+        end.GameData(
+            [3, 6, 8, 25, 50, 75, 100], 952, "(6+50)x(25-8)", 30, 60).save()
+        games = history.get_game_data()
+        difficulty = targets.estimate_difficulty(
+            (3, 6, 8, 25, 50, 75, 100), 952)
+        level = difficulty.level
+        # The level is saved with the signals behind it.
+        self.assertEqual(
+            games[0]["difficulty"], [level, difficulty.solution_count, 4])
+        self.assertEqual(games[1]["difficulty"], games[0]["difficulty"])
+        # Older games without a recorded difficulty are left out.
+        del games[0]["difficulty"]
+        data = stats.get_all_stats(games, days_to_seconds(30))
+        self.assertEqual(sum(data["difficulty_games"]), 1)
+        self.assertEqual(data["difficulty_wins"][level], 1)
+        self.assertEqual(
+            stats.get_win_rates([2, 0, 4], [1, 0, 4]), ["50%", "-", "100%"])
+        reset_data()
+
+    def test_solution_cache(self):
+        reset_data()
+        settings = solutions.SolutionGenerationSettings(
+            4, 7, 10, True, "+-*/", 10)
+        key = settings.get_cache_key([100, 2, 3, 4, 5, 25, 50], 250)
+        self.assertEqual(
+            key, solutions.SolutionGenerationSettings(
+                4, 7, 50, True, "/*-+", 60).get_cache_key(
+                    [2, 3, 4, 5, 25, 50, 100], 250))
+        self.assertIsNone(solutions.get_cached_solutions(key))
+        solutions.add_cached_solutions(key, ["100+150", "2x125"], False)
+        solutions.add_cached_solutions(key, ["2x125", "50x5"], True)
+        self.assertEqual(
+            solutions.get_cached_solutions(key),
+            (["100+150", "2x125", "50x5"], True, None))
+
+        for i in range(10):
+            solutions.add_cached_solutions(str(i), [], False)
+            if i == 0:
+                # Now more recently used than the first i.
+                solutions.get_cached_solutions(key)
+        cache = solutions.load_solution_cache()
+        # Only room for all but the least recently used.
+        max_bytes = sum(
+            len(json.dumps({k: entry}, separators=(",", ":")))
+            for k, entry in cache.items() if k != "0")
+        with mock.patch.object(
+            solutions, "MAX_SOLUTION_CACHE_BYTES", max_bytes
+        ):
+            solutions.add_cached_solutions("9", [], False)
+        cache = solutions.load_solution_cache()
+        self.assertIn(key, cache)
+        self.assertNotIn("0", cache)
+        self.assertEqual(len(cache), 10)
+        # The nearest expression is only kept once known to be unsolvable.
+        solutions.add_cached_solutions("a", [], False, ("1+2", 3))
+        self.assertEqual(
+            solutions.get_cached_solutions("a"), ([], False, None))
+        solutions.add_cached_solutions("a", [], True, ("1+2", 3))
+        self.assertEqual(
+            solutions.get_cached_solutions("a"), ([], True, ("1+2", 3)))
+        reset_data()
+
     def test_special_achievements(self):
         reset_data()
         for achievement in achievements.get_special_achievements():
@@ -1,12 +1,22 @@
 import unittest
 import sys
 import secrets
+import itertools
+import ast
+import ctypes
+import re
+import struct
+from fractions import Fraction
+import tempfile
+import threading
 
 sys.path.extend((".", "./src"))
 
 from src.mechanics import solutions
+from src.mechanics import targets
 from src import game
 from src.utils.io import reset_data
+from src.utils.utils import machine_expression
 
 
 def generate_numbers():
@@ -28,6 +38,26 @@ def generate_numbers():
     return numbers
 
 
+def evaluate_integer_only(expression: str) -> Fraction:
+    """
+    Evaluates a solution, checking every intermediate result
+    is a positive integer.
+    """
+    def evaluate(node: ast.AST) -> Fraction:
+        if isinstance(node, ast.Constant):
+            return Fraction(node.value)
+        a, b = evaluate(node.left), evaluate(node.right)
+        result = {
+            ast.Add: lambda: a + b, ast.Sub: lambda: a - b,
+            ast.Mult: lambda: a * b, ast.Div: lambda: a / b
+        }[type(node.op)]()
+        if result <= 0 or result.denominator != 1:
+            raise ValueError(f"{expression} breaks the integer rule.")
+        return result
+    return evaluate(ast.parse(
+        expression.replace("x", "*").replace("÷", "/"), mode="eval").body)
+
+
 class TestGenerate(unittest.TestCase):
 
     def test_generate_number(self):
@@ -37,7 +67,161 @@ class TestGenerate(unittest.TestCase):
             number = game.generate_number(numbers)
             self.assertTrue(201 <= number <= 999 and isinstance(number, int))
         reset_data()
-    
+
+    def test_generate_number_in_background(self):
+        reset_data()
+        future = game.generate_number_in_background(generate_numbers())
+        number = future.result(10)
+        self.assertTrue(201 <= number <= 999 and isinstance(number, int))
+        self.assertEqual(game.get_recent_numbers(), [number])
+        reset_data()
+
+    def test_stop_generating_number(self):
+        numbers = [3, 6, 8, 25, 50, 75, 100]
+        self.assertEqual(
+            game._generate_number(
+                (ctypes.c_int * 7)(*numbers), None, 0,
+                ctypes.byref(ctypes.c_int(True)), ctypes.c_longlong(0),
+                False),
+            solutions.SEARCH_CANCELLED)
+        self.assertEqual(
+            game._generate_number(
+                (ctypes.c_int * 7)(*numbers), None, 0, None,
+                ctypes.c_longlong(1), False),
+            solutions.SEARCH_TIMED_OUT)
+        with self.assertRaises(TimeoutError):
+            targets.ReachabilityMap(numbers, cancel=ctypes.c_int(True))
+        with self.assertRaises(TimeoutError):
+            targets.ReachabilityMap(numbers, deadline_ns=1)
+
+    def test_target_table(self):
+        self.assertEqual(len(targets.get_number_selections()), 3192)
+        self.assertIsNone(targets.get_slot([1, 2, 3, 4, 5, 6, 7]))
+        self.assertIsNone(targets.get_slot([2, 2, 25, 50, 75, 100, 25]))
+        with tempfile.TemporaryDirectory() as folder:
+            file = f"{folder}/targets.bin"
+            targets.build_target_table(file)
+            table = targets.TargetTable(file)
+            for _ in range(30):
+                numbers = generate_numbers()
+                self.assertEqual(
+                    table.get_targets(numbers),
+                    targets.get_native_possible_targets(numbers))
+                possible = table.get_targets(numbers)
+                self.assertIn(table.get_random_target(numbers), possible)
+                self.assertEqual(
+                    table.get_random_target(numbers, possible[1:]),
+                    possible[0])
+                self.assertEqual(
+                    table.get_random_target(numbers, possible[:-1]),
+                    possible[-1])
+                self.assertIsNone(table.get_random_target(numbers, possible))
+            table.data.close()
+
+            # Tables built by another version are never used.
+            with open(file, "r+b") as f:
+                f.seek(len(targets.MAGIC))
+                f.write(struct.pack(
+                    targets.VERSION_FORMAT, targets.TABLE_VERSION + 1))
+            with self.assertRaises(ValueError):
+                targets.TargetTable(file)
+
+            file = f"{folder}/integer_targets.bin"
+            targets.build_target_table(file, True)
+            table = targets.TargetTable(file)
+            for _ in range(30):
+                numbers = generate_numbers()
+                self.assertEqual(
+                    table.get_targets(numbers),
+                    targets.get_native_possible_targets(numbers, True))
+            table.data.close()
+
+    def test_reachability_map(self):
+        for _ in range(5):
+            numbers = generate_numbers()
+            reachability = targets.ReachabilityMap(numbers, integer_only=True)
+            # Possible targets need exactly 4 numbers, no fewer.
+            self.assertEqual(
+                [
+                    value for value in range(
+                        targets.MIN_TARGET, targets.MAX_TARGET + 1)
+                    if reachability.get_number_count(value) == 4],
+                targets.get_native_possible_targets(numbers, True))
+            for value in range(targets.MIN_TARGET, targets.MAX_TARGET + 1):
+                count = reachability.get_number_count(value)
+                if count is None:
+                    self.assertIsNone(reachability.get_witness(value))
+                    continue
+                witness = reachability.get_witness(value)
+                self.assertEqual(evaluate_integer_only(witness), value)
+                self.assertEqual(
+                    len(re.findall(r"\d+", witness)), count, witness)
+            reachability.close()
+
+        reachability = targets.ReachabilityMap(
+            [3, 6, 8, 25, 50, 75, 100], 1, 2000)
+        self.assertEqual(reachability.get_number_count(952), 4)
+        self.assertEqual(reachability.get_number_count(75), 1)
+        self.assertIsNone(reachability.get_number_count(0))
+        for value in (1, 17, 952, 1999):
+            self.assertEqual(eval(machine_expression(
+                reachability.get_witness(value))), value)
+        reachability.close()
+
+    def test_estimate_difficulty(self):
+        difficulty = targets.estimate_difficulty(
+            (3, 6, 8, 25, 50, 75, 100), 952)
+        self.assertEqual(difficulty.solution_count, 1067)
+        self.assertEqual(difficulty.min_number_count, 4)
+        self.assertIn(difficulty.level, range(len(targets.DIFFICULTY_LEVELS)))
+        # 2 x 3 is one of 6 trees: 2, 3, 2+3, 2-3, 2x3, 2÷3.
+        difficulty = targets.estimate_difficulty((2, 3), 6)
+        self.assertEqual(difficulty.solution_count, 1)
+        self.assertAlmostEqual(difficulty.fraction, 1 / 6)
+        difficulty = targets.estimate_difficulty((2, 3, 4, 5), 999)
+        self.assertEqual(difficulty.solution_count, 0)
+        self.assertIsNone(difficulty.min_number_count)
+        self.assertEqual(
+            difficulty.level, len(targets.DIFFICULTY_LEVELS) - 1)
+
+        for _ in range(5):
+            numbers = generate_numbers()
+            target = secrets.choice(range(201, 1000))
+            reachability = targets.ReachabilityMap(
+                numbers, target, target, integer_only=True)
+            difficulty = targets.estimate_difficulty(tuple(numbers), target)
+            self.assertEqual(
+                difficulty.min_number_count,
+                reachability.get_number_count(target))
+            self.assertEqual(
+                difficulty.solution_count > 0,
+                difficulty.min_number_count is not None)
+            reachability.close()
+
+    def test_permutation_sampler(self):
+        for numbers in (
+            generate_numbers(), [2, 3, 4, 5, 6, 7, 8],
+            [2, 3, 25, 25, 50, 100, 100]
+        ):
+            sampler = solutions.PermutationSampler(numbers, 4, 5)
+            perms = list(sampler)
+            # Repeated numbers are interchangeable, so no duplicates.
+            expected = set(itertools.permutations(numbers, 4)) | set(
+                itertools.permutations(numbers, 5))
+            self.assertEqual(len(perms), len(expected))
+            self.assertEqual(set(perms), expected)
+            self.assertEqual(list(sampler), [])
+
+            sampler = solutions.PermutationSampler(
+                numbers, 4, 7, ordered=False)
+            combinations = list(sampler)
+            expected = {
+                tuple(sorted(combination)) for count in range(4, 8)
+                for combination in itertools.combinations(numbers, count)}
+            self.assertEqual(len(combinations), len(expected))
+            self.assertEqual(
+                {tuple(sorted(c)) for c in combinations}, expected)
+
     def test_generate_solutions(self):
         numbers = generate_numbers()
         target = game.generate_number(numbers)
@@ -66,11 +250,276 @@ class TestGenerate(unittest.TestCase):
             self.assertEqual(round(
                 eval(r.replace("x", "*").replace("÷", "/")), 10), target)
 
+        streamed = []
+        settings = solutions.SolutionGenerationSettings(
+            4, 7, 10, False, "+-*/", float("inf"))
+        result = solutions.generate_solutions(
+            numbers, target, settings, streamed.append)
+        self.assertEqual(streamed, result)
+        self.assertFalse(settings.exhaustive)
+
+        settings = solutions.SolutionGenerationSettings(
+            4, 4, 10000, False, "+-*", float("inf"))
+        result = solutions.generate_solutions(
+            numbers, target, settings, excluded=set(result))
+        self.assertTrue(settings.exhaustive)
+        self.assertFalse(set(result) & set(streamed))
+
         settings = solutions.SolutionGenerationSettings(
             4, 7, 0, True, "+-*/", 3)
         result = solutions.generate_solutions(numbers, target, settings)
         self.assertEqual(len(result), 0)
 
+    def test_pairwise_solver(self):
+        with self.assertRaises(ValueError):
+            solutions.SolutionGenerationSettings(
+                4, 7, 1, False, "+-*/", 10, solver=solutions.PAIRWISE_SOLVER)
+
+        numbers = [3, 6, 8, 25, 50, 75, 100]
+        settings = solutions.SolutionGenerationSettings(
+            4, 7, 25, True, "+-*/", float("inf"),
+            solver=solutions.PAIRWISE_SOLVER)
+        result = solutions.generate_solutions(numbers, 952, settings)
+        self.assertEqual(len(result), 25)
+        for r in result:
+            self.assertEqual(round(
+                eval(r.replace("x", "*").replace("÷", "/")), 10), 952)
+
+        settings = solutions.SolutionGenerationSettings(
+            4, 4, 100, True, "+-*/", float("inf"),
+            solver=solutions.PAIRWISE_SOLVER, find_nearest=True)
+        self.assertEqual(
+            solutions.generate_solutions(numbers, 10 ** 7, settings), [])
+        self.assertTrue(settings.exhaustive)
+        # 100 x 75 x 50 x 25 is the largest possible.
+        solution, value = settings.nearest
+        self.assertEqual(value, 9375000)
+        self.assertEqual(eval(solution.replace("x", "*")), 9375000)
+
+        # Stopping early is reported, even with solutions found.
+        buffer = ctypes.create_string_buffer(solutions.SOLUTION_BUFFER_SIZE)
+        status = ctypes.c_int()
+        solutions.get_pairwise_solutions(
+            (ctypes.c_int * 7)(*numbers), 7, 952, b"+-*/", False, 1,
+            buffer, solutions.SOLUTION_BUFFER_SIZE, None,
+            ctypes.c_longlong(1), None, None, None, ctypes.byref(status))
+        self.assertEqual(status.value, solutions.SEARCH_TIMED_OUT)
+        solutions.get_pairwise_solutions(
+            (ctypes.c_int * 4)(3, 6, 8, 25), 4, 250, b"+-*/", False, 1000,
+            buffer, solutions.SOLUTION_BUFFER_SIZE, None,
+            ctypes.c_longlong(0), None, None, None, ctypes.byref(status))
+        self.assertEqual(status.value, 0)
+
+    def test_integer_only(self):
+        reset_data()
+        for _ in range(10):
+            numbers = generate_numbers()
+            target = game.generate_number(numbers, integer_only=True)
+            self.assertIn(
+                target, targets.get_native_possible_targets(numbers, True))
+            for solver in (
+                solutions.TEMPLATE_SOLVER, solutions.PAIRWISE_SOLVER
+            ):
+                settings = solutions.SolutionGenerationSettings(
+                    4, 4, 1000, True, "+-*/", float("inf"),
+                    solver=solver, integer_only=True)
+                result = solutions.generate_solutions(
+                    numbers, target, settings)
+                # Always possible with 4 numbers.
+                self.assertTrue(result)
+                for r in result:
+                    self.assertEqual(evaluate_integer_only(r), target)
+        reset_data()
+
+    def test_equivalent_solutions(self):
+        found = solutions.create_solution_set()
+        for expression, new in (
+            ("25+50*4", True), ("4*50+25", False), ("(50*4)+25", False),
+            ("(1+2)+3", True), ("1+(3+2)", False), ("3+2+1", False),
+            ("1-(2-3)", True), ("1-2+3", False), ("1-2-3", True),
+            ("8/(4/2)", True), ("8*2/4", False), ("8/4/2", True)
+        ):
+            self.assertEqual(
+                solutions.add_to_solution_set(found, expression.encode()),
+                new, expression)
+        solutions.free_solution_set(found)
+
+        numbers = [2, 3, 4, 25, 50, 75, 100]
+        settings = solutions.SolutionGenerationSettings(
+            4, 4, 10000, False, "+-*", float("inf"))
+        result = solutions.generate_solutions(numbers, 250, settings)
+        found = solutions.create_solution_set()
+        for solution in result:
+            self.assertTrue(solutions.add_to_solution_set(
+                found, solution.replace("x", "*").encode()))
+        solutions.free_solution_set(found)
+
+    def test_stream_solutions(self):
+        numbers = [2, 3, 4, 25, 50, 75, 100]
+        settings = solutions.SolutionGenerationSettings(
+            4, 4, 10000, False, "+-*", float("inf"))
+        expected = solutions.generate_solutions(numbers, 250, settings)
+        streamed = []
+        settings = solutions.SolutionGenerationSettings(
+            4, 4, 10000, False, "+-*", float("inf"))
+        result = solutions.stream_solutions(
+            numbers, 250, settings, streamed.append)
+        self.assertTrue(settings.exhaustive)
+        self.assertEqual(streamed, result)
+        # Same solutions, but not necessarily the same equivalent forms.
+        self.assertEqual(len(result), len(expected))
+        for r in result:
+            self.assertEqual(eval(r.replace("x", "*")), 250)
+
+        settings = solutions.SolutionGenerationSettings(
+            4, 5, 5, True, "+-*/", float("inf"))
+        result = solutions.stream_solutions(
+            [3, 6, 25, 25, 50, 75, 100], 250, settings)
+        self.assertEqual(len(result), 5)
+        self.assertFalse(settings.exhaustive)
+
+        settings = solutions.SolutionGenerationSettings(
+            7, 7, 1, True, "+-*/", 1)
+        self.assertEqual(
+            solutions.stream_solutions(numbers, 10 ** 9, settings), [])
+        # Stopped by the deadline rather than searching every permutation.
+        self.assertFalse(settings.exhaustive)
+        self.assertEqual(
+            solutions.enumerate_solutions(
+                (ctypes.c_int * 7)(*numbers), 7, 7, 7, 10 ** 9, b"+-*/",
+                True, False, solutions.SOLUTION_CALLBACK(lambda _: 0),
+                None, ctypes.c_longlong(1), None),
+            solutions.SEARCH_TIMED_OUT)
+
+    def test_uniform_sampling(self):
+        with self.assertRaises(ValueError):
+            solutions.SolutionGenerationSettings(
+                4, 7, 1, True, "+-*/", 10, solver=solutions.PAIRWISE_SOLVER,
+                uniform=True)
+
+        buffer = ctypes.create_string_buffer(4096)
+
+        def sample(numbers: list[int], target: int, size: int) -> list[bytes]:
+            solutions.sample_solutions(
+                (ctypes.c_int * len(numbers))(*numbers), len(numbers), target,
+                b"+-*/", True, False, size, buffer, 4096,
+                None, ctypes.c_longlong(0), None, None, None)
+            return buffer.value.split(b"\n")
+
+        every_solution = set(sample([2, 3, 4, 5, 6], 60, 1000))
+        counts = dict.fromkeys(every_solution, 0)
+        for _ in range(100 * len(every_solution)):
+            solution, = sample([2, 3, 4, 5, 6], 60, 1)
+            counts[solution] += 1
+        # Every solution is sampled, and roughly as often as the others.
+        self.assertEqual(len(counts), len(every_solution))
+        self.assertGreater(min(counts.values()), 50)
+
+        def count_distinct(sampled: list[bytes]) -> int:
+            found = ctypes.c_void_p(solutions.create_solution_set())
+            try:
+                return sum(
+                    solutions.add_to_solution_set(found, solution)
+                    for solution in sampled)
+            finally:
+                solutions.free_solution_set(found)
+
+        # Equivalent forms never take more than one place in a sample.
+        sampled = sample([5, 5, 5, 5], 20, 1000)
+        self.assertEqual(count_distinct(sampled), len(sampled))
+        for size in range(1, len(sampled) + 1):
+            self.assertEqual(
+                count_distinct(sample([5, 5, 5, 5], 20, size)), size)
+
+        settings = solutions.SolutionGenerationSettings(
+            4, 7, 10, True, "+-*/", float("inf"), uniform=True)
+        result = solutions.generate_solutions(
+            [3, 6, 8, 25, 50, 75, 100], 952, settings)
+        self.assertEqual(len(result), 10)
+        for r in result:
+            self.assertEqual(round(
+                eval(r.replace("x", "*").replace("÷", "/")), 10), 952)
+
+    def test_round_hints(self):
+        reset_data()
+        hints = solutions.RoundHints([3, 6, 8, 25, 50, 75, 100], 952)
+        hints.find_in_background()
+        self.assertTrue(hints.finished.wait(solutions.HINTS_SECONDS_LIMIT + 5))
+        self.assertTrue(hints.solvable)
+        self.assertEqual(hints.min_number_count, 4)
+        self.assertEqual(eval(machine_expression(hints.example)), 952)
+        self.assertEqual(
+            len(hints.solutions), solutions.DEFAULT_SOLUTION_COUNT)
+        # Ready for the solutions screen with its default settings.
+        cached, _, _ = solutions.get_cached_solutions(
+            hints.settings.get_cache_key(hints.numbers, hints.target))
+        self.assertEqual(cached, hints.solutions)
+
+        hints = solutions.RoundHints([2, 3, 4, 5], 999)
+        hints.find()
+        self.assertIs(hints.solvable, False)
+        self.assertIsNone(hints.min_number_count)
+        self.assertEqual(hints.solutions, [])
+        # So the solutions screen can show the nearest without a search.
+        cached, exhaustive, (_, value) = solutions.get_cached_solutions(
+            hints.settings.get_cache_key(hints.numbers, hints.target))
+        self.assertEqual((cached, exhaustive, value), ([], True, 120))
+
+        hints = solutions.RoundHints([3, 6, 8, 25, 50, 75, 100], 952)
+        hints.cancel()
+        hints.find()
+        self.assertTrue(hints.finished.is_set())
+        self.assertIsNone(hints.min_number_count)
+        self.assertEqual(hints.solutions, [])
+        reset_data()
+
+    def test_nearest_solution(self):
+        numbers = [2, 3, 4, 25, 50, 75, 100]
+        # Only addition with 4 numbers, so 34 is always the nearest.
+        settings = solutions.SolutionGenerationSettings(
+            4, 4, 1, True, "+", float("inf"), find_nearest=True)
+        self.assertEqual(
+            solutions.generate_solutions(numbers[:4], 1, settings), [])
+        solution, value = settings.nearest
+        self.assertEqual(value, 34)
+        self.assertEqual(eval(solution), 34)
+
+        settings = solutions.SolutionGenerationSettings(
+            4, 4, 1, True, "+-*/", float("inf"), find_nearest=True)
+        self.assertEqual(
+            len(solutions.generate_solutions(numbers, 250, settings)), 1)
+        self.assertIsNone(settings.nearest)
+
+    def test_stop_generating_solutions(self):
+        numbers = [2, 3, 5, 7, 9, 25, 75]
+        # Unreachable target - search would otherwise take far too long.
+        settings = solutions.SolutionGenerationSettings(
+            7, 7, 1, True, "+-*/", 1)
+        self.assertEqual(
+            solutions.generate_solutions(numbers, 10 ** 9, settings), [])
+        self.assertFalse(settings.exhaustive)
+
+        settings = solutions.SolutionGenerationSettings(
+            7, 7, 1, True, "+-*/", float("inf"))
+        threading.Timer(
+            0.5, lambda: setattr(settings.cancel, "value", True)).start()
+        self.assertEqual(
+            solutions.generate_solutions(numbers, 10 ** 9, settings), [])
+        self.assertTrue(settings.cancel.value)
+        self.assertFalse(settings.exhaustive)
+
+        buffer = ctypes.create_string_buffer(256)
+
+        def get_solution(cancel: bool, deadline_ns: int) -> int:
+            return solutions.get_solution(
+                (ctypes.c_int * 7)(*numbers), 7, 10 ** 9, b"+-*/", True,
+                False, buffer, 256, ctypes.byref(ctypes.c_int(cancel)),
+                ctypes.c_longlong(deadline_ns), None,
+                ctypes.byref(ctypes.c_double()), None)
+
+        self.assertEqual(get_solution(True, 0), solutions.SEARCH_CANCELLED)
+        self.assertEqual(get_solution(False, 1), solutions.SEARCH_TIMED_OUT)
+
 
 if __name__ == "__main__":
-    unittest.main()
\ No newline at end of file
+    unittest.main()
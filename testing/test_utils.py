@@ -1,6 +1,7 @@
 import unittest
 import sys
 import math
+from fractions import Fraction
 
 sys.path.extend((".", "./src"))
 
@@ -27,7 +28,8 @@ class TestUtils(unittest.TestCase):
             ("(1+2)*(3-4)", -3),
             ("(5-6)/(5*(3+2))", -0.04),
             ("(666*666)/(555/555-1)", float("nan")),
-            ("((((((((((1+1))))))))))", 2)
+            ("((((((((((1+1))))))))))", 2),
+            ("", float("nan"))
         )
         for expression, answer in expressions_and_answers:
             value = utils.evaluate(expression)
@@ -37,6 +39,86 @@ class TestUtils(unittest.TestCase):
                 f"{expression} != {answer}"
             )
     
+    def test_evaluate_exact(self):
+        expressions_and_answers = (
+            ("1+1", 2),
+            ("1/3", Fraction(1, 3)),
+            ("1/3+1/3+1/3", 1),
+            ("(1/3-1/3)*7", 0),
+            ("2/(3/(4/(5/(6/7))))", Fraction(2 * 4 * 6, 3 * 5 * 7)),
+            ("(5-6)/(5*(3+2))", Fraction(-1, 25)),
+            ("100/(3-5)", -50),
+            ("0/0", None),
+            ("(666*666)/(555/555-1)", None),
+            # Too big for 64-bit integers, so evaluated in Python.
+            ("99999999999*99999999999", 99999999999 ** 2),
+            ("1/99999999999/99999999999", Fraction(1, 99999999999 ** 2)),
+            ("99999999999*99999999999/(1-1)", None),
+            # Malformed, so never read past the end.
+            ("", None),
+            ("1+", None),
+            ("5*", None),
+            ("(1+2", None),
+            ("1+2)", None),
+            ("99999999999*99999999999+", None)
+        )
+        for expression, answer in expressions_and_answers:
+            self.assertEqual(
+                utils.evaluate_exact(expression), answer, expression)
+        self.assertEqual(
+            utils.evaluate_many(
+                [expression for expression, _ in expressions_and_answers]),
+            [answer for _, answer in expressions_and_answers])
+        self.assertEqual(utils.evaluate_many([]), [])
+
+    def test_analyse_solution(self):
+        analysis = utils.analyse_solution("(100+6)x(75-25÷(50-3))÷8")
+        self.assertEqual(
+            analysis.value, Fraction(106 * (75 * 47 - 25), 47 * 8))
+        self.assertEqual(
+            analysis.operator_counts, {"+": 1, "-": 2, "x": 1, "÷": 2})
+        self.assertEqual(analysis.numbers, [100, 6, 75, 25, 50, 3, 8])
+        self.assertEqual(analysis.small_numbers, 3)
+        self.assertEqual(analysis.big_numbers, 4)
+        self.assertEqual(analysis.max_depth, 2)
+
+        analysis = utils.analyse_solution("7")
+        self.assertEqual(analysis.value, 7)
+        self.assertEqual(analysis.max_depth, 0)
+        for expression in (
+            "1+2*3/4+5", "6-5-4", "(5-6)/(5*(3+2))", "2/(3/(4/(5/(6/7))))",
+            "(666*666)/(555/555-1)", "((((((((((1+1))))))))))"
+        ):
+            self.assertEqual(
+                utils.analyse_solution(expression).value,
+                utils.evaluate_exact(expression), expression)
+
+    def test_solution_evaluator(self):
+        evaluator = utils.SolutionEvaluator()
+        values = []
+        for token in ("100", "-", "(", "6", "x", "3", ")", "÷", "4"):
+            evaluator.push(token)
+            if token not in "-x÷(":
+                values.append(evaluator.get_value())
+        # Open parentheses treated as closed.
+        self.assertEqual(values, [100, 94, 82, 82, Fraction(191, 2)])
+        for _ in range(3):
+            evaluator.pop()
+        self.assertEqual(evaluator.get_value(), 82)
+        evaluator.push("+")
+        evaluator.push("25")
+        self.assertEqual(evaluator.get_value(), 57)
+
+        evaluator.reset()
+        for token in ("7", "/", "(", "3", "-", "3", ")"):
+            evaluator.push(token)
+        self.assertIsNone(evaluator.get_value())
+        evaluator.pop()
+        self.assertIsNone(evaluator.get_value())
+        evaluator.pop()
+        evaluator.pop()
+        self.assertEqual(evaluator.get_value(), Fraction(7, 3))
+
     def test_seconds_to_hhmmss(self):
         seconds_and_hhmmss = (
             (0, "00:00:00"),